@@ -0,0 +1,87 @@
+"""Per-request overhead of ConfigMiddleware with streaming responses
+
+Run from the top of the checkout::
+
+    python benchmarks/bench_config_middleware.py
+
+Reports the time per request through ``ConfigMiddleware`` wrapping an
+app that returns a generator (so the close wrapper is used), next to
+the bare app, and the time of the first request in a fresh
+interpreter (which used to import Paste).
+"""
+import subprocess
+import sys
+import timeit
+
+from paste.deploy.config import ConfigMiddleware
+
+CONFIG = dict(('key%s' % i, 'value%s' % i) for i in range(20))
+
+FIRST_REQUEST = '''
+import time
+from paste.deploy.config import ConfigMiddleware
+
+def app(environ, start_response):
+    start_response('200 OK', [])
+    yield b'body'
+
+start = time.time()
+app_iter = ConfigMiddleware(app, {'key': 'value'})({}, lambda *a: None)
+list(app_iter)
+app_iter.close()
+print(time.time() - start)
+'''
+
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+
+def streaming_app(environ, start_response):
+    start_response('200 OK', [('Content-type', 'text/plain')])
+    yield b'body'
+
+
+def request(app):
+    app_iter = app({}, start_response)
+    try:
+        for chunk in app_iter:
+            pass
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def per_request(app, number):
+    return min(timeit.repeat(lambda: request(app), number=number,
+                             repeat=5)) / number
+
+
+def first_request():
+    output = subprocess.check_output([sys.executable, '-c', FIRST_REQUEST])
+    return float(output.decode('ascii'))
+
+
+def benchmarks():
+    copying = ConfigMiddleware(streaming_app, CONFIG)
+    copy_on_write = ConfigMiddleware(streaming_app, CONFIG,
+                                     copy_on_write=True)
+    return [
+        ('request/bare-app', lambda: request(streaming_app)),
+        ('request/ConfigMiddleware', lambda: request(copying)),
+        ('request/ConfigMiddleware-copy-on-write',
+         lambda: request(copy_on_write)),
+        ]
+
+
+def main(number=20000):
+    bare = per_request(streaming_app, number)
+    wrapped = per_request(ConfigMiddleware(streaming_app, CONFIG), number)
+    print('bare app:              %8.2f us/request' % (bare * 1e6))
+    print('ConfigMiddleware:      %8.2f us/request' % (wrapped * 1e6))
+    print('middleware overhead:   %8.2f us/request'
+          % ((wrapped - bare) * 1e6))
+    print('first request:         %8.2f ms' % (first_request() * 1e3))
+
+if __name__ == '__main__':
+    main()
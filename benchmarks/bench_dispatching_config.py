@@ -0,0 +1,66 @@
+"""Push/pop and lookup costs of DispatchingConfig
+
+Run from the top of the checkout::
+
+    python benchmarks/bench_dispatching_config.py
+
+Compares the ``contextvars`` stack (the default on Python 3.7+) with
+the ``threading.local`` one it replaced.
+"""
+import timeit
+
+from paste.deploy import config
+
+
+class ThreadLocalDispatchingConfig(config.DispatchingConfig):
+    _stack_class = config._ThreadLocalStack
+
+
+def push_pop(dispatching, conf):
+    dispatching.push_thread_config(conf)
+    dispatching.pop_thread_config(conf)
+
+
+def time_per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def bench(cls, number):
+    dispatching = cls()
+    conf = {'key': 'value'}
+    results = {'push/pop': time_per_call(
+        lambda: push_pop(dispatching, conf), number)}
+    dispatching.push_thread_config(conf)
+    results['current_conf()'] = time_per_call(
+        dispatching.current_conf, number)
+    results["config['key']"] = time_per_call(
+        lambda: dispatching['key'], number)
+    results['config.get()'] = time_per_call(
+        lambda: dispatching.get('key'), number)
+    dispatching.pop_thread_config(conf)
+    return results
+
+
+def benchmarks():
+    dispatching = config.DispatchingConfig()
+    conf = {'key': 'value'}
+    pushed = config.DispatchingConfig()
+    pushed.push_thread_config(conf)
+    return [
+        ('DispatchingConfig/push-pop', lambda: push_pop(dispatching, conf)),
+        ('DispatchingConfig/lookup', lambda: pushed['key']),
+        ]
+
+
+def main(number=200000):
+    implementations = [('threading.local', ThreadLocalDispatchingConfig)]
+    if config.ContextVar is not None:
+        implementations.append(('contextvars', config.DispatchingConfig))
+    results = [(name, bench(cls, number)) for name, cls in implementations]
+    print('%-16s' % '' + ''.join('%18s' % name for name, r in results))
+    for operation in sorted(results[0][1]):
+        print('%-16s' % operation + ''.join(
+            '%15.3f us' % (r[operation] * 1e6) for name, r in results))
+
+if __name__ == '__main__':
+    main()
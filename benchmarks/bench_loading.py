@@ -0,0 +1,162 @@
+"""Loading generated configurations with loadapp
+
+Each configuration is loaded "cold" -- with the parsed-file cache and
+the entry point index emptied first, as in a fresh process that has
+already imported the factories -- and "warm", with both caches
+filled.  The configurations are:
+
+``sections-N``
+    a composite loading N apps from one file
+``use-chain-N``
+    an app reached through N ``use = other_section`` references
+``pipeline-N``
+    a pipeline of N filters
+``interpolation-N``
+    N apps, each with settings that refer to each other and to
+    ``[DEFAULT]`` through ``%(name)s`` references
+``egg-filters`` / ``call-filters``
+    a pipeline of 100 filters found through ``egg:`` entry points,
+    and the same through ``call:`` references
+
+``loadapp/cold/one-of-N/eager`` and ``.../lazy`` load a single app
+from the ``sections-N`` file, parsing the whole file or only the
+sections needed (``ConfigLoader.lazy_threshold``).
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from paste.deploy import loadapp, entrypoints
+from paste.deploy.loadwsgi import ConfigLoader, config_cache
+
+SECTIONS = (10, 100, 1000, 10000)
+USE_CHAINS = (10, 100)
+PIPELINES = (10, 100, 1000)
+INTERPOLATIONS = (10, 100)
+
+_directory = None
+
+
+def directory():
+    global _directory
+    if _directory is None:
+        _directory = tempfile.mkdtemp(prefix='paste-deploy-bench-')
+        atexit.register(shutil.rmtree, _directory, True)
+    return _directory
+
+
+def write_config(name, lines):
+    filename = os.path.join(directory(), name + '.ini')
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return filename
+
+
+def sections_config(count):
+    lines = ['[DEFAULT]', 'debug = false', '',
+             '[composite:main]', 'use = call:benchapps:make_composite']
+    lines.extend('app.%s = app%s' % (i, i) for i in range(count))
+    for i in range(count):
+        lines.extend(['', '[app:app%s]' % i, 'use = call:benchapps:make_app',
+                      'setting = value %s' % i])
+    return write_config('sections-%s' % count, lines)
+
+
+def use_chain_config(depth):
+    lines = ['[app:level0]', 'use = call:benchapps:make_app']
+    for i in range(1, depth + 1):
+        lines.extend(['', '[app:level%s]' % i, 'use = level%s' % (i - 1),
+                      'setting%s = value' % i])
+    lines.extend(['', '[app:main]', 'use = level%s' % depth])
+    return write_config('use-chain-%s' % depth, lines)
+
+
+def interpolation_config(count):
+    lines = ['[DEFAULT]', 'root = /srv', 'logs = %(root)s/log',
+             'data = %(root)s/data', '',
+             '[composite:main]', 'use = call:benchapps:make_composite']
+    lines.extend('app.%s = app%s' % (i, i) for i in range(count))
+    for i in range(count):
+        lines.extend(['', '[app:app%s]' % i, 'use = call:benchapps:make_app',
+                      'name = app%s' % i,
+                      'base = %(data)s/%(name)s',
+                      'cache = %(base)s/cache',
+                      'uploads = %(base)s/uploads',
+                      'log = %(logs)s/%(name)s.log',
+                      'summary = %(cache)s %(uploads)s %(log)s'])
+    return write_config('interpolation-%s' % count, lines)
+
+
+def pipeline_config(length, filter_use='call:benchapps:make_filter',
+                    name=None):
+    lines = ['[pipeline:main]',
+             'pipeline = %s app' % ' '.join(
+                 'filter%s' % i for i in range(length)),
+             '', '[app:app]', 'use = call:benchapps:make_app']
+    for i in range(length):
+        lines.extend(['', '[filter:filter%s]' % i, 'use = %s' % filter_use,
+                      'prefix = /p%s' % i])
+    return write_config(name or 'pipeline-%s' % length, lines)
+
+
+def clear_caches():
+    config_cache.invalidate()
+    entrypoints.clear_index_cache()
+
+
+def cold(uri):
+    def load():
+        clear_caches()
+        loadapp(uri)
+    return load
+
+
+def cold_one(uri, lazy):
+    def load():
+        clear_caches()
+        old = ConfigLoader.lazy_threshold
+        ConfigLoader.lazy_threshold = -1 if lazy else float('inf')
+        try:
+            loadapp(uri, name='app0')
+        finally:
+            ConfigLoader.lazy_threshold = old
+    return load
+
+
+def warm(uri):
+    def load():
+        loadapp(uri)
+    return load
+
+
+def configs():
+    """
+    Yield ``(name, uri)`` for every generated configuration.
+    """
+    for count in SECTIONS:
+        yield 'sections-%s' % count, 'config:' + sections_config(count)
+    for depth in USE_CHAINS:
+        yield 'use-chain-%s' % depth, 'config:' + use_chain_config(depth)
+    for count in INTERPOLATIONS:
+        yield ('interpolation-%s' % count,
+               'config:' + interpolation_config(count))
+    for length in PIPELINES:
+        yield 'pipeline-%s' % length, 'config:' + pipeline_config(length)
+    yield 'egg-filters', 'config:' + pipeline_config(
+        100, 'egg:PasteDeploy#prefix', name='egg-filters')
+    yield 'call-filters', 'config:' + pipeline_config(
+        100, name='call-filters')
+
+
+def benchmarks():
+    result = []
+    for name, uri in configs():
+        result.append(('loadapp/cold/' + name, cold(uri)))
+        result.append(('loadapp/warm/' + name, warm(uri)))
+    for count in SECTIONS:
+        uri = 'config:' + sections_config(count)
+        for mode in ('eager', 'lazy'):
+            result.append(('loadapp/cold/one-of-%s/%s' % (count, mode),
+                           cold_one(uri, mode == 'lazy')))
+    return result
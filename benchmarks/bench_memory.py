@@ -0,0 +1,86 @@
+"""Memory held by resolved contexts of a generated multi-tenant config
+
+Run from the top of the checkout::
+
+    python benchmarks/bench_memory.py
+
+The config has a ``[DEFAULT]`` section with many settings, one base
+app section, and for each tenant an app section using the base and a
+pipeline of shared filters in front of it.  The contexts of every
+tenant's pipeline are resolved, and the memory they hold (measured
+with ``tracemalloc``, after a warm-up so the parsed file is cached) is
+reported.
+"""
+import gc
+import tracemalloc
+
+from paste.deploy.loadwsgi import APP, ConfigLoader
+
+from bench_loading import write_config
+
+TENANTS = (100, 1000)
+DEFAULTS = 50
+
+
+def multi_tenant_config(tenants):
+    lines = ['[DEFAULT]']
+    lines.extend('shared_setting_%s = shared value %s' % (i, i)
+                 for i in range(DEFAULTS))
+    lines.extend(['', '[app:base]', 'use = call:benchapps:make_app'])
+    lines.extend('base_setting_%s = base value %s' % (i, i)
+                 for i in range(20))
+    for name in ('auth', 'log', 'gzip'):
+        lines.extend(['', '[filter:%s]' % name,
+                      'use = call:benchapps:make_filter',
+                      'prefix = /%s' % name])
+    for i in range(tenants):
+        lines.extend([
+            '', '[app:tenant%s]' % i, 'use = base',
+            'tenant = tenant%s' % i,
+            'database = postgresql://db/tenant%s' % i,
+            '', '[pipeline:tenant%s_pipeline]' % i,
+            'pipeline = auth log gzip tenant%s' % i])
+    return write_config('multi-tenant-%s' % tenants, lines)
+
+
+def resolve_all(filename, tenants):
+    loader = ConfigLoader(filename)
+    return [loader.get_context(APP, 'tenant%s_pipeline' % i)
+            for i in range(tenants)]
+
+
+def retained_bytes(tenants):
+    filename = multi_tenant_config(tenants)
+    resolve_all(filename, tenants)  # warm the parsed-file cache
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        contexts = resolve_all(filename, tenants)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del contexts
+    return after - before
+
+
+def memory_benchmarks():
+    return [('memory/multi-tenant-%s' % tenants,
+             lambda tenants=tenants: retained_bytes(tenants))
+            for tenants in TENANTS]
+
+
+def benchmarks():
+    filename = multi_tenant_config(1000)
+    return [('resolve/multi-tenant-1000',
+             lambda: resolve_all(filename, 1000))]
+
+
+def main():
+    for tenants in TENANTS:
+        print('%5s tenants: %10.1f KiB held by contexts'
+              % (tenants, retained_bytes(tenants) / 1024.0))
+
+if __name__ == '__main__':
+    main()
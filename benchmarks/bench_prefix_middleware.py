@@ -0,0 +1,113 @@
+"""Throughput of PrefixMiddleware
+
+Run from the top of the checkout::
+
+    python benchmarks/bench_prefix_middleware.py
+
+Compares PrefixMiddleware with the regular-expression based version
+it replaced (copied below), for a plain request and one carrying
+``X-Forwarded-*`` headers.
+"""
+import re
+import timeit
+
+from paste.deploy.config import PrefixMiddleware
+
+
+class RegexPrefixMiddleware(object):
+    """
+    PrefixMiddleware as of PasteDeploy 1.5.0.
+    """
+
+    def __init__(self, app, global_conf=None, prefix='/',
+                 translate_forwarded_server=True,
+                 force_port=None, scheme=None):
+        self.app = app
+        self.prefix = prefix.rstrip('/')
+        self.translate_forwarded_server = translate_forwarded_server
+        self.regprefix = re.compile("^%s(.*)$" % self.prefix)
+        self.force_port = force_port
+        self.scheme = scheme
+
+    def __call__(self, environ, start_response):
+        url = environ['PATH_INFO']
+        url = re.sub(self.regprefix, r'\1', url)
+        if not url:
+            url = '/'
+        environ['PATH_INFO'] = url
+        environ['SCRIPT_NAME'] = self.prefix
+        if self.translate_forwarded_server:
+            if 'HTTP_X_FORWARDED_SERVER' in environ:
+                environ['SERVER_NAME'] = environ['HTTP_HOST'] = environ.pop('HTTP_X_FORWARDED_SERVER').split(',')[0]
+            if 'HTTP_X_FORWARDED_HOST' in environ:
+                environ['HTTP_HOST'] = environ.pop('HTTP_X_FORWARDED_HOST').split(',')[0]
+            if 'HTTP_X_FORWARDED_FOR' in environ:
+                environ['REMOTE_ADDR'] = environ.pop('HTTP_X_FORWARDED_FOR').split(',')[0]
+            if 'HTTP_X_FORWARDED_SCHEME' in environ:
+                environ['wsgi.url_scheme'] = environ.pop('HTTP_X_FORWARDED_SCHEME')
+            elif 'HTTP_X_FORWARDED_PROTO' in environ:
+                environ['wsgi.url_scheme'] = environ.pop('HTTP_X_FORWARDED_PROTO')
+        if self.force_port is not None:
+            host = environ.get('HTTP_HOST', '').split(':', 1)[0]
+            if self.force_port:
+                host = '%s:%s' % (host, self.force_port)
+                environ['SERVER_PORT'] = str(self.force_port)
+            else:
+                if environ['wsgi.url_scheme'] == 'http':
+                    port = '80'
+                else:
+                    port = '443'
+                environ['SERVER_PORT'] = port
+            environ['HTTP_HOST'] = host
+        if self.scheme is not None:
+            environ['wsgi.url_scheme'] = self.scheme
+        return self.app(environ, start_response)
+
+
+BASE_ENVIRON = {
+    'PATH_INFO': '/james/purchase_orders/1', 'SCRIPT_NAME': '',
+    'SERVER_NAME': 'backend', 'SERVER_PORT': '8080',
+    'HTTP_HOST': 'backend:8080', 'REMOTE_ADDR': '10.0.0.1',
+    'wsgi.url_scheme': 'http',
+    }
+
+PROXIED_ENVIRON = dict(
+    BASE_ENVIRON, HTTP_X_FORWARDED_HOST='example.com',
+    HTTP_X_FORWARDED_FOR='192.0.2.1, 10.0.0.2',
+    HTTP_X_FORWARDED_PROTO='https')
+
+
+def app(environ, start_response):
+    return []
+
+
+def requests_per_second(middleware, environ, number):
+    copy = environ.copy
+    timings = timeit.repeat(lambda: middleware(copy(), None),
+                            number=number, repeat=5)
+    return number / min(timings)
+
+
+def benchmarks():
+    middleware = PrefixMiddleware(app, prefix='/james')
+    return [
+        ('request/PrefixMiddleware/plain',
+         lambda: middleware(BASE_ENVIRON.copy(), None)),
+        ('request/PrefixMiddleware/proxied',
+         lambda: middleware(PROXIED_ENVIRON.copy(), None)),
+        ]
+
+
+def main(number=100000):
+    implementations = [
+        ('regex (1.5.0)', RegexPrefixMiddleware(app, prefix='/james')),
+        ('current', PrefixMiddleware(app, prefix='/james')),
+        ]
+    print('%-14s %16s %16s' % ('', 'plain req/s', 'proxied req/s'))
+    for name, middleware in implementations:
+        print('%-14s %16.0f %16.0f' % (
+            name, requests_per_second(middleware, BASE_ENVIRON, number),
+            requests_per_second(middleware, PROXIED_ENVIRON, number)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""Minimal factories used by the generated benchmark configs"""
+from paste.deploy.config import PrefixMiddleware
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-type', 'text/plain')])
+    return [b'ok']
+
+
+def make_app(global_conf, **local_conf):
+    return app
+
+
+def make_filter(global_conf, prefix='/', **local_conf):
+    def filter(app):
+        return PrefixMiddleware(app, prefix=prefix)
+    return filter
+
+
+def make_composite(loader, global_conf, **local_conf):
+    apps = {}
+    for key, name in local_conf.items():
+        if key.startswith('app.'):
+            apps[key[4:]] = loader.get_app(name, global_conf=global_conf)
+    return apps
@@ -0,0 +1,198 @@
+"""Run the Paste Deploy benchmarks
+
+Run from the top of the checkout::
+
+    python benchmarks/run.py -o results.json
+    python benchmarks/run.py -o new.json --compare results.json
+
+Every ``benchmarks/bench_*.py`` module provides a ``benchmarks()``
+function returning ``(name, func)`` pairs; ``func`` is called
+repeatedly without arguments.  Each benchmark is calibrated to run
+for at least ``--min-time`` seconds per sample, and the time per call
+of every sample is recorded.  Modules may also provide
+``memory_benchmarks()``, whose functions return a number of bytes.
+
+The JSON file written with ``-o`` holds the environment and, for every
+benchmark, its samples plus their mean, minimum and standard
+deviation (in seconds per call, or bytes).  With ``--compare``,
+benchmarks whose mean is more than ``--threshold`` slower (or larger)
+than in the given file are reported, and the exit status is 1 if there
+are any.
+
+``-k PATTERN`` only runs benchmarks whose name contains ``PATTERN``
+(e.g. ``-k request/`` or ``-k warm``).
+"""
+from __future__ import print_function
+import glob
+import json
+import math
+import optparse
+import os
+import platform
+import sys
+import time
+import timeit
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+FORMAT_VERSION = 1
+
+
+def load_benchmarks(pattern=None, kind='benchmarks'):
+    """
+    Return the ``(name, func)`` pairs of every module's ``kind``
+    function (``benchmarks`` or ``memory_benchmarks``).
+    """
+    if here not in sys.path:
+        sys.path.insert(0, here)
+    result = []
+    for filename in sorted(glob.glob(os.path.join(here, 'bench_*.py'))):
+        module_name = os.path.splitext(os.path.basename(filename))[0]
+        module = __import__(module_name)
+        if not hasattr(module, kind):
+            continue
+        for name, func in getattr(module, kind)():
+            if pattern is None or pattern in name:
+                result.append((name, func))
+    return result
+
+
+def calibrate(func, min_time):
+    """
+    Return the number of calls that take at least ``min_time``.
+    """
+    loops = 1
+    while True:
+        elapsed = timeit.timeit(func, number=loops)
+        if elapsed >= min_time:
+            return loops
+        if elapsed <= 0:
+            loops *= 10
+        else:
+            loops = max(loops + 1, int(loops * min_time / elapsed * 1.2))
+
+
+def summarize(values, **extra):
+    mean = sum(values) / len(values)
+    if len(values) > 1:
+        stdev = math.sqrt(sum((v - mean) ** 2 for v in values)
+                          / (len(values) - 1))
+    else:
+        stdev = 0.0
+    result = {'samples': values, 'mean': mean, 'min': min(values),
+              'stdev': stdev}
+    result.update(extra)
+    return result
+
+
+def run_benchmark(func, samples, min_time):
+    func()  # warmup
+    loops = calibrate(func, min_time)
+    timings = [timeit.timeit(func, number=loops) / loops
+               for i in range(samples)]
+    return summarize(timings, loops=loops, unit='seconds')
+
+
+def run_memory_benchmark(func, samples):
+    return summarize([float(func()) for i in range(samples)], unit='bytes')
+
+
+def environment():
+    from paste.deploy import entrypoints
+    try:
+        version = entrypoints.get_distribution('PasteDeploy').version
+    except Exception:
+        version = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'pastedeploy': version,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '%.2f %s' % (seconds / scale, unit)
+    return '%.0f ns' % (seconds / 1e-9)
+
+
+def format_bytes(size):
+    for unit, scale in (('MiB', 1024 ** 2), ('KiB', 1024)):
+        if size >= scale:
+            return '%.1f %s' % (size / scale, unit)
+    return '%.0f B' % size
+
+
+def format_value(result, value):
+    if result.get('unit') == 'bytes':
+        return format_bytes(value)
+    return format_time(value)
+
+
+def compare(results, baseline, threshold):
+    """
+    Print how ``results`` compare with ``baseline``, and return the
+    names of the benchmarks that got slower by more than ``threshold``.
+    """
+    slower = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        change = result['mean'] / old['mean'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            slower.append(name)
+        print('%-50s %12s -> %12s  %+6.1f%%%s' % (
+            name, format_value(result, old['mean']),
+            format_value(result, result['mean']), change * 100, flag))
+    return slower
+
+
+def main(args=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-o', '--output', metavar='FILENAME',
+                      help='Write the results as JSON to FILENAME')
+    parser.add_option('-k', dest='pattern', metavar='PATTERN',
+                      help='Only run benchmarks whose name contains PATTERN')
+    parser.add_option('--samples', type='int', default=5,
+                      help='Number of samples per benchmark (default 5)')
+    parser.add_option('--min-time', type='float', default=0.1,
+                      help='Minimum seconds per sample (default 0.1)')
+    parser.add_option('--compare', metavar='FILENAME',
+                      help='Compare with the results in FILENAME')
+    parser.add_option('--threshold', type='float', default=0.1,
+                      help='Slowdown reported by --compare, as a fraction '
+                      '(default 0.1)')
+    options, args = parser.parse_args(args)
+    results = {}
+    for name, func in load_benchmarks(options.pattern):
+        result = results[name] = run_benchmark(
+            func, options.samples, options.min_time)
+        print('%-50s %12s +- %s' % (name, format_time(result['mean']),
+                                    format_time(result['stdev'])))
+        sys.stdout.flush()
+    for name, func in load_benchmarks(options.pattern, 'memory_benchmarks'):
+        result = results[name] = run_memory_benchmark(func, options.samples)
+        print('%-50s %12s +- %s' % (name, format_bytes(result['mean']),
+                                    format_bytes(result['stdev'])))
+        sys.stdout.flush()
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump({'version': FORMAT_VERSION,
+                       'environment': environment(),
+                       'benchmarks': results}, f, indent=1, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)['benchmarks']
+        print()
+        if compare(results, baseline, options.threshold):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
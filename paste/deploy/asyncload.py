@@ -0,0 +1,82 @@
+# (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
+# Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
+"""Awaitable variants of the ``paste.deploy.loadwsgi`` loaders
+
+These load the same configurations as :func:`loadapp` and friends,
+but also support factories using the asynchronous protocols
+``paste.async_app_factory`` and ``paste.async_filter_factory``: the
+factory is called like its synchronous counterpart and returns an
+awaitable, which is awaited to get the app or filter.  The
+independent parts of pipelines, ``filter-app`` and ``filter-with``
+sections are created concurrently on the running event loop.
+
+Composites are not supported: their factories load their apps through
+the synchronous ``loader.get_app()``, which raises ``TypeError`` for
+asynchronous protocols.  Neither does :mod:`paste.deploy.bootstrap`
+compile them.
+
+Requires Python 3.5 or newer.
+"""
+import asyncio
+import inspect
+
+# get_event_loop() is deprecated inside coroutines; Python < 3.7 only
+# has that
+_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+from paste.deploy.loadwsgi import (
+    APP, FILTER, SERVER, ASYNC_PROTOCOLS, loadcontext)
+
+__all__ = ['aloadapp', 'aloadfilter', 'aloadserver', 'aloadobj',
+           'acreate']
+
+
+async def aloadapp(uri, name=None, **kw):
+    return await aloadobj(APP, uri, name=name, **kw)
+
+
+async def aloadfilter(uri, name=None, **kw):
+    return await aloadobj(FILTER, uri, name=name, **kw)
+
+
+async def aloadserver(uri, name=None, **kw):
+    return await aloadobj(SERVER, uri, name=name, **kw)
+
+
+async def aloadobj(object_type, uri, name=None, relative_to=None,
+                   global_conf=None, executor=None):
+    """
+    Load and create an object, awaiting asynchronous factories.
+
+    Synchronous factories are called on the event loop's thread, or
+    with ``loop.run_in_executor(executor, ...)`` if ``executor`` is
+    given, so that slow ones don't block the asynchronous ones.
+    """
+    context = loadcontext(
+        object_type, uri, name=name, relative_to=relative_to,
+        global_conf=global_conf)
+    return await acreate(context, executor=executor)
+
+
+async def acreate(context, executor=None):
+    """
+    Create the object for ``context``, creating the objects it is
+    composed of concurrently.
+    """
+    dependencies = context.object_type.dependencies(context)
+    if dependencies is not None:
+        objects = await asyncio.gather(*[
+            acreate(dependency, executor=executor)
+            for dependency in dependencies])
+        return context.object_type.compose(context, list(objects))
+    if context.protocol in ASYNC_PROTOCOLS:
+        return await context.object_type.invoke_async(context)
+    if executor is not None:
+        loop = _running_loop()
+        obj = await loop.run_in_executor(executor, context.create)
+    else:
+        obj = context.create()
+    if inspect.isawaitable(obj):
+        # e.g. a "call:" reference to a coroutine function
+        obj = await obj
+    return obj
@@ -0,0 +1,248 @@
+# (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
+# Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
+"""Compile a configuration into a plain Python module
+
+The configuration is resolved once (e.g. when building an image), and
+the generated module creates the same objects with direct imports and
+literal configuration dictionaries, without parsing anything::
+
+    $ python -m paste.deploy.bootstrap config:production.ini#main \\
+          -o myapp_bootstrap.py
+
+and then in the worker::
+
+    import myapp_bootstrap
+    app = myapp_bootstrap.create()
+
+Composites still load their apps through a loader, which parses the
+config file when it is first used.  Asynchronous protocols are not
+supported.
+"""
+from __future__ import with_statement
+import optparse
+import os
+import sys
+from pprint import pformat
+
+from paste.deploy.loadwsgi import APP, FILTER, SERVER, loadcontext, record_files
+from paste.deploy.plan import ContextPlan, fingerprint
+
+__all__ = ['compile_bootstrap', 'compile_plan', 'main']
+
+_object_types = {'application': APP, 'filter': FILTER, 'server': SERVER}
+
+# The order in which each composed type creates its parts
+_child_order = {
+    'pipeline': ('app_context', 'filter_contexts'),
+    'filter_app': ('next_context', 'filter_context'),
+    'filtered_with': ('filter_context', 'next_context'),
+    }
+
+_header = '''\
+"""Creates %(description)s
+
+Generated by paste.deploy.bootstrap; do not edit.  Regenerate it
+whenever the configuration changes (see is_current()).
+"""
+import hashlib
+'''
+
+_helpers = '''
+
+def _filter_app_factory(factory, global_conf, local_conf):
+    def filter_wrapper(wsgi_app):
+        return factory(wsgi_app, dict(global_conf), **local_conf)
+    return filter_wrapper
+
+
+def _compose_filters(filter, filtered):
+    def composed(app):
+        return filter(filtered(app))
+    return composed
+
+
+def is_current():
+    """
+    Return true if none of the config files this module was generated
+    from have changed.
+    """
+    for filename, digest in FILES:
+        try:
+            with open(filename, 'rb') as f:
+                if hashlib.sha1(f.read()).hexdigest() != digest:
+                    return False
+        except (IOError, OSError):
+            return False
+    return True
+'''
+
+
+class _Compiler(object):
+
+    def __init__(self):
+        self.imports = []
+        self.constants = []
+        self._constant_names = {}
+        self.lines = []
+        self.uses_loader = False
+        self._counter = 0
+
+    def name(self, prefix):
+        self._counter += 1
+        return '%s%s' % (prefix, self._counter)
+
+    def factory(self, spec):
+        module, attrs = (spec.split(':', 1) + [''])[:2]
+        module = module.strip()
+        if module not in self.imports:
+            self.imports.append(module)
+        attrs = attrs.strip()
+        if attrs:
+            return '%s.%s' % (module, attrs)
+        return module
+
+    def constant(self, prefix, value):
+        text = pformat(value)
+        if text not in self._constant_names:
+            name = '%s_%s' % (prefix, len([
+                n for n in self._constant_names.values()
+                if n.startswith(prefix + '_')]))
+            self._constant_names[text] = name
+            self.constants.append('%s = %s' % (name, text))
+        return self._constant_names[text]
+
+    def emit(self, line):
+        self.lines.append('    ' + line)
+
+    def node(self, plan):
+        """
+        Emit the code creating the object for ``plan``, and return the
+        name of the variable holding it.
+        """
+        if plan.object_type in _child_order:
+            return self.composed(plan)
+        var = self.name('_obj')
+        factory = self.factory(plan.object_spec)
+        global_conf = self.constant('GLOBAL_CONF', plan.global_conf)
+        local_conf = self.constant('LOCAL_CONF', plan.local_conf)
+        protocol = plan.protocol
+        if protocol in ('paste.app_factory', 'paste.filter_factory',
+                        'paste.server_factory'):
+            self.emit('%s = %s(dict(%s), **%s)'
+                      % (var, factory, global_conf, local_conf))
+        elif protocol in ('paste.composite_factory',
+                          'paste.composit_factory'):
+            self.uses_loader = True
+            loader = self.constant('LOADER', plan.loader)
+            self.emit('%s = %s(PlannedLoader(%s), dict(%s), **%s)'
+                      % (var, factory, loader, global_conf, local_conf))
+        elif protocol in ('paste.filter_app_factory',
+                          'paste.server_runner'):
+            self.emit('%s = _filter_app_factory(%s, %s, %s)'
+                      % (var, factory, global_conf, local_conf))
+        else:
+            raise ValueError(
+                "Cannot compile %r: protocol %r is not supported"
+                % (plan, protocol))
+        return var
+
+    def composed(self, plan):
+        parts = {}
+        for attr in _child_order[plan.object_type]:
+            child = plan.children[attr]
+            if isinstance(child, list):
+                parts[attr] = [self.node(c) for c in child]
+            else:
+                parts[attr] = self.node(child)
+        var = self.name('_obj')
+        if plan.object_type == 'pipeline':
+            app = parts['app_context']
+            for filter_var in reversed(parts['filter_contexts']):
+                self.emit('%s = %s(%s)' % (var, filter_var, app))
+                app = var
+            if app != var:
+                self.emit('%s = %s' % (var, app))
+        elif plan.object_type == 'filter_app':
+            self.emit('%s = %s(%s)' % (var, parts['filter_context'],
+                                       parts['next_context']))
+        elif plan.children['next_context'].object_type == 'application':
+            self.emit('%s = %s(%s)' % (var, parts['filter_context'],
+                                       parts['next_context']))
+        else:
+            # filtering a filter
+            self.emit('%s = _compose_filters(%s, %s)'
+                      % (var, parts['filter_context'],
+                         parts['next_context']))
+        return var
+
+
+def compile_plan(plan, description='the configured object', files=()):
+    """
+    Return the source of a module whose ``create()`` function creates
+    the object for ``plan`` (a :class:`~paste.deploy.plan.ContextPlan`).
+    ``files`` is a list of config filenames whose contents
+    ``is_current()`` checks.
+    """
+    compiler = _Compiler()
+    result = compiler.node(plan)
+    out = [_header % {'description': description}]
+    for module in compiler.imports:
+        out.append('import %s\n' % module)
+    if compiler.uses_loader:
+        out.append('from paste.deploy.plan import PlannedLoader\n')
+    out.append('\n')
+    out.append('FILES = %s\n' % pformat(
+        [(filename, fingerprint(filename))
+         for filename in sorted(set(files))]))
+    for constant in compiler.constants:
+        out.append('%s\n' % constant)
+    out.append(_helpers)
+    out.append('\n\ndef create():\n')
+    out.append('\n'.join(compiler.lines))
+    out.append('\n    return %s\n' % result)
+    return ''.join(out)
+
+
+def compile_bootstrap(uri, name=None, relative_to=None, global_conf=None,
+                      object_type=APP):
+    """
+    Resolve ``uri`` and return the source of a bootstrap module for
+    it (see :func:`compile_plan`).
+    """
+    context, files = record_files(
+        loadcontext, object_type, uri, name=name, relative_to=relative_to,
+        global_conf=global_conf)
+    plan = ContextPlan.from_context(context)
+    description = '%s %s' % (object_type.name, uri)
+    if name:
+        description += '#' + name
+    return compile_plan(plan, description=description, files=files)
+
+
+def main(args=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] CONFIG_URI',
+        description='Compile a Paste Deploy configuration '
+        '(e.g. config:production.ini#main) into a Python module.')
+    parser.add_option('-o', '--output', metavar='FILENAME',
+                      help='Write the module to FILENAME (default: stdout)')
+    parser.add_option('-t', '--type', default='application',
+                      choices=sorted(_object_types),
+                      help='Type of object: application (default), '
+                      'filter or server')
+    options, args = parser.parse_args(args)
+    if len(args) != 1:
+        parser.error('Exactly one CONFIG_URI is required')
+    uri = args[0]
+    if ':' not in uri.split('#', 1)[0]:
+        uri = 'config:' + uri
+    source = compile_bootstrap(uri, relative_to=os.getcwd(),
+                               object_type=_object_types[options.type])
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(source)
+    else:
+        sys.stdout.write(source)
+
+if __name__ == '__main__':
+    main()
@@ -14,19 +14,53 @@ def print_(template, *args, **kwargs):
 
 if sys.version_info < (3, 0):
     basestring = basestring
-    from ConfigParser import ConfigParser
+    from ConfigParser import (
+        ConfigParser, InterpolationError, InterpolationMissingOptionError,
+        InterpolationSyntaxError)
+    SectionProxy = BasicInterpolation = None
     from urllib import unquote
+    from StringIO import StringIO
     iteritems = lambda d: d.iteritems()
     dictkeys = lambda d: d.keys()
 
+    def intern(s, _intern=intern):
+        # The builtin only takes byte strings
+        if type(s) is str:
+            return _intern(s)
+        return s
+
     def reraise(t, e, tb):
         exec('raise t, e, tb', dict(t=t, e=e, tb=tb))
 else:
     basestring = str
-    from configparser import ConfigParser
+    from configparser import (
+        ConfigParser, SectionProxy, BasicInterpolation, InterpolationError,
+        InterpolationMissingOptionError, InterpolationSyntaxError)
     from urllib.parse import unquote
+    from io import StringIO
     iteritems = lambda d: d.items()
     dictkeys = lambda d: list(d.keys())
+    intern = sys.intern
 
     def reraise(t, e, tb):
         raise e.with_traceback(tb)
+
+from collections import OrderedDict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    # Python 2
+    from collections import MutableMapping
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    # Python < 3.7
+    ContextVar = None
+
+try:
+    from concurrent import futures
+except ImportError:
+    # Python 2 without the "futures" backport
+    futures = None
@@ -1,11 +1,14 @@
 # (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
 # Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
 """Paste Configuration Middleware and Objects"""
+import inspect
 import threading
 import re
 
+from paste.deploy.compat import ContextVar
+from paste.deploy.util import CopyOnWriteDict
+
 # Loaded lazily
-wsgilib = None
 local = None
 
 __all__ = ['DispatchingConfig', 'CONFIG', 'ConfigMiddleware', 'PrefixMiddleware']
@@ -24,6 +27,58 @@ def local_dict():
         return result
 
 
+class _ThreadLocalStack(object):
+    """
+    The configurations pushed in each thread.
+    """
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def push(self, conf):
+        local_dict().setdefault(self.key, []).append(conf)
+
+    def pop(self):
+        return local_dict()[self.key].pop()
+
+    def top(self):
+        configs = local_dict().get(self.key)
+        if configs:
+            return configs[-1]
+        return None
+
+
+class _ContextStack(object):
+    """
+    The configurations pushed in each context -- thread, asyncio task
+    or greenlet -- kept as linked ``(conf, parent)`` pairs, so pushing
+    and popping never affects other contexts.
+    """
+
+    __slots__ = ('var',)
+
+    def __init__(self, key):
+        self.var = ContextVar(key, default=None)
+
+    def push(self, conf):
+        self.var.set((conf, self.var.get()))
+
+    def pop(self):
+        stack = self.var.get()
+        if stack is None:
+            raise IndexError('pop from empty configuration stack')
+        self.var.set(stack[1])
+        return stack[0]
+
+    def top(self):
+        stack = self.var.get()
+        if stack is None:
+            return None
+        return stack[0]
+
+
 class DispatchingConfig(object):
 
     """
@@ -32,7 +87,10 @@ class DispatchingConfig(object):
     by thread (or may not).
 
     Specific configurations are registered (and deregistered) either
-    for the process or for threads.
+    for the process or for threads.  Where ``contextvars`` is available
+    (Python 3.7+), "thread" configurations are really per context, so
+    they are also kept apart between asyncio tasks and greenlets that
+    share a thread.
     """
 
     # @@: What should happen when someone tries to add this
@@ -40,18 +98,28 @@ class DispatchingConfig(object):
     # resolved, and get rid of this delegation wrapper
 
     _constructor_lock = threading.Lock()
+    # The keys are only put in local_dict() on the first push, so the
+    # ids handed out are counted too
+    _next_id = 0
+
+    if ContextVar is not None:
+        _stack_class = _ContextStack
+    else:
+        _stack_class = _ThreadLocalStack
 
     def __init__(self):
         self._constructor_lock.acquire()
         try:
-            self.dispatching_id = 0
+            self.dispatching_id = DispatchingConfig._next_id
             while 1:
                 self._local_key = 'paste.processconfig_%i' % self.dispatching_id
                 if not self._local_key in local_dict():
                     break
                 self.dispatching_id += 1
+            DispatchingConfig._next_id = self.dispatching_id + 1
         finally:
             self._constructor_lock.release()
+        self._thread_configs = self._stack_class(self._local_key)
         self._process_configs = []
 
     def push_thread_config(self, conf):
@@ -69,7 +137,7 @@ class DispatchingConfig(object):
             finally:
                 dispatching_config.pop_thread_config(conf)
         """
-        local_dict().setdefault(self._local_key, []).append(conf)
+        self._thread_configs.push(conf)
 
     def pop_thread_config(self, conf=None):
         """
@@ -77,10 +145,9 @@ class DispatchingConfig(object):
         it is checked against the popped configuration and an error
         is emitted if they don't match.
         """
-        self._pop_from(local_dict()[self._local_key], conf)
+        self._check_popped(self._thread_configs.pop(), conf)
 
-    def _pop_from(self, lst, conf):
-        popped = lst.pop()
+    def _check_popped(self, popped, conf):
         if conf is not None and popped is not conf:
             raise AssertionError(
                 "The config popped (%s) is not the same as the config "
@@ -95,7 +162,7 @@ class DispatchingConfig(object):
         self._process_configs.append(conf)
 
     def pop_process_config(self, conf=None):
-        self._pop_from(self._process_configs, conf)
+        self._check_popped(self._process_configs.pop(), conf)
 
     def __getattr__(self, attr):
         conf = self.current_conf()
@@ -106,9 +173,9 @@ class DispatchingConfig(object):
         return getattr(conf, attr)
 
     def current_conf(self):
-        thread_configs = local_dict().get(self._local_key)
-        if thread_configs:
-            return thread_configs[-1]
+        conf = self._thread_configs.top()
+        if conf is not None:
+            return conf
         elif self._process_configs:
             return self._process_configs[-1]
         else:
@@ -143,24 +210,41 @@ class ConfigMiddleware(object):
     (for the length of the request) with ``paste.CONFIG``.
     """
 
-    def __init__(self, application, config):
+    def __init__(self, application, config, copy_on_write=False):
         """
         This delegates all requests to `application`, adding a *copy*
         of the configuration `config`.
+
+        If `copy_on_write` is true, requests get a
+        :class:`~paste.deploy.util.CopyOnWriteDict` over a snapshot of
+        `config` taken here instead of a full copy, so only requests
+        that change their configuration allocate anything.  Later
+        changes to `config` itself are not seen by requests then.
+        Every read goes through Python code, so this only pays off for
+        large configurations; copying a small one is faster (see
+        ``benchmarks/bench_config_middleware.py``).
         """
         self.application = application
         self.config = config
+        if copy_on_write:
+            self._base_config = dict(config)
+        else:
+            self._base_config = None
+
+    def request_config(self):
+        """
+        Return the configuration for a new request.
+        """
+        if self._base_config is not None:
+            return CopyOnWriteDict(self._base_config)
+        return self.config.copy()
 
     def __call__(self, environ, start_response):
-        global wsgilib
-        if wsgilib is None:
-            import pkg_resources
-            pkg_resources.require('Paste')
-            from paste import wsgilib
+        file_wrapper = environ.get('wsgi.file_wrapper')
         popped_config = None
         if 'paste.config' in environ:
             popped_config = environ['paste.config']
-        conf = environ['paste.config'] = self.config.copy()
+        conf = environ['paste.config'] = self.request_config()
         app_iter = None
         CONFIG.push_thread_config(conf)
         try:
@@ -182,14 +266,77 @@ class ConfigMiddleware(object):
         else:
             def close_config():
                 CONFIG.pop_thread_config(conf)
-            new_app_iter = wsgilib.add_close(app_iter, close_config)
-            return new_app_iter
+            return _add_close(app_iter, close_config, file_wrapper)
+
+
+def _add_close(app_iter, close_func, file_wrapper=None):
+    """
+    Return an app_iter that calls ``close_func`` when it is closed.
+    An instance of the server's ``wsgi.file_wrapper`` is returned
+    itself, with its ``close`` extended, so the server can still send
+    the file directly (e.g. with ``sendfile()``).
+    """
+    # (inspect.isclass also accepts the old-style classes of Python 2,
+    # like wsgiref's FileWrapper)
+    if inspect.isclass(file_wrapper) and isinstance(app_iter, file_wrapper):
+        original_close = getattr(app_iter, 'close', None)
+
+        def close():
+            try:
+                if original_close is not None:
+                    original_close()
+            finally:
+                close_func()
+        try:
+            app_iter.close = close
+        except AttributeError:
+            # e.g. a wrapper with __slots__
+            pass
+        else:
+            return app_iter
+    return _CloseIter(app_iter, close_func)
+
+
+class _CloseIter(object):
+    """
+    Wraps an app_iter, calling ``close_func`` when it is closed (after
+    closing the app_iter itself).
+    """
+
+    __slots__ = ('app_iter', 'close_func', '_next', '_closed')
+
+    def __init__(self, app_iter, close_func):
+        self.app_iter = app_iter
+        self.close_func = close_func
+        iterator = iter(app_iter)
+        self._next = getattr(iterator, '__next__', None) or iterator.next
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._next()
+
+    next = __next__
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self.close_func()
 
 
 def make_config_filter(app, global_conf, **local_conf):
+    from paste.deploy.converters import asbool
+    copy_on_write = asbool(local_conf.pop('copy_on_write', False))
     conf = global_conf.copy()
     conf.update(local_conf)
-    return ConfigMiddleware(app, conf)
+    return ConfigMiddleware(app, conf, copy_on_write=copy_on_write)
 
 make_config_middleware = ConfigMiddleware.__doc__
 
@@ -235,6 +382,13 @@ class PrefixMiddleware(object):
     translated to the ``Host`` header, for cases when that header is
     lost in the proxying.  Also ``X-Forwarded-Host``,
     ``X-Forwarded-Scheme``, and ``X-Forwarded-Proto`` are translated.
+    Only the first (client side) value of each is used.
+
+    With ``translate_forwarded = true``, the ``for``, ``host`` and
+    ``proto`` parameters of the standard ``Forwarded`` header (RFC
+    7239) are translated too, with ``X-Forwarded-*`` headers taking
+    precedence.  This is off by default: only turn it on if your proxy
+    sets or strips ``Forwarded``, or clients can forge it.
 
     If ``force_port`` is set, SERVER_PORT and HTTP_HOST will be
     rewritten with the given port.  You can use a number, string (like
@@ -248,58 +402,138 @@ class PrefixMiddleware(object):
     """
     def __init__(self, app, global_conf=None, prefix='/',
                  translate_forwarded_server=True,
-                 force_port=None, scheme=None):
+                 force_port=None, scheme=None, translate_forwarded=False):
         self.app = app
         self.prefix = prefix.rstrip('/')
         self.translate_forwarded_server = translate_forwarded_server
-        self.regprefix = re.compile("^%s(.*)$" % self.prefix)
+        self.translate_forwarded = translate_forwarded
+        self.regprefix = re.compile("^%s(.*)$" % re.escape(self.prefix))
         self.force_port = force_port
         self.scheme = scheme
+        # The environ rewrites this instance does, in order
+        rewrites = []
+        if translate_forwarded:
+            rewrites.append(_translate_forwarded)
+        if translate_forwarded_server:
+            rewrites.append(_translate_x_forwarded)
+        if force_port is not None:
+            rewrites.append(self._force_port)
+        if scheme is not None:
+            rewrites.append(self._set_scheme)
+        self._rewrites = tuple(rewrites)
 
     def __call__(self, environ, start_response):
+        prefix = self.prefix
         url = environ['PATH_INFO']
-        url = re.sub(self.regprefix, r'\1', url)
-        if not url:
-            url = '/'
-        environ['PATH_INFO'] = url
-        environ['SCRIPT_NAME'] = self.prefix
-        if self.translate_forwarded_server:
-            if 'HTTP_X_FORWARDED_SERVER' in environ:
-                environ['SERVER_NAME'] = environ['HTTP_HOST'] = environ.pop('HTTP_X_FORWARDED_SERVER').split(',')[0]
-            if 'HTTP_X_FORWARDED_HOST' in environ:
-                environ['HTTP_HOST'] = environ.pop('HTTP_X_FORWARDED_HOST').split(',')[0]
-            if 'HTTP_X_FORWARDED_FOR' in environ:
-                environ['REMOTE_ADDR'] = environ.pop('HTTP_X_FORWARDED_FOR').split(',')[0]
-            if 'HTTP_X_FORWARDED_SCHEME' in environ:
-                environ['wsgi.url_scheme'] = environ.pop('HTTP_X_FORWARDED_SCHEME')
-            elif 'HTTP_X_FORWARDED_PROTO' in environ:
-                environ['wsgi.url_scheme'] = environ.pop('HTTP_X_FORWARDED_PROTO')
-        if self.force_port is not None:
-            host = environ.get('HTTP_HOST', '').split(':', 1)[0]
-            if self.force_port:
-                host = '%s:%s' % (host, self.force_port)
-                environ['SERVER_PORT'] = str(self.force_port)
-            else:
-                if environ['wsgi.url_scheme'] == 'http':
-                    port = '80'
-                else:
-                    port = '443'
-                environ['SERVER_PORT'] = port
-            environ['HTTP_HOST'] = host
-        if self.scheme is not None:
-            environ['wsgi.url_scheme'] = self.scheme
+        if prefix and url.startswith(prefix):
+            url = url[len(prefix):]
+        environ['PATH_INFO'] = url or '/'
+        environ['SCRIPT_NAME'] = prefix
+        for rewrite in self._rewrites:
+            rewrite(environ)
         return self.app(environ, start_response)
 
+    def _force_port(self, environ):
+        host = environ.get('HTTP_HOST', '').split(':', 1)[0]
+        if self.force_port:
+            host = '%s:%s' % (host, self.force_port)
+            environ['SERVER_PORT'] = str(self.force_port)
+        else:
+            if environ['wsgi.url_scheme'] == 'http':
+                port = '80'
+            else:
+                port = '443'
+            environ['SERVER_PORT'] = port
+        environ['HTTP_HOST'] = host
+
+    def _set_scheme(self, environ):
+        environ['wsgi.url_scheme'] = self.scheme
+
+
+def _translate_x_forwarded(environ):
+    value = environ.pop('HTTP_X_FORWARDED_SERVER', None)
+    if value is not None:
+        environ['SERVER_NAME'] = environ['HTTP_HOST'] = value.split(',')[0]
+    value = environ.pop('HTTP_X_FORWARDED_HOST', None)
+    if value is not None:
+        environ['HTTP_HOST'] = value.split(',')[0]
+    value = environ.pop('HTTP_X_FORWARDED_FOR', None)
+    if value is not None:
+        environ['REMOTE_ADDR'] = value.split(',')[0]
+    value = environ.pop('HTTP_X_FORWARDED_SCHEME', None)
+    if value is None:
+        value = environ.pop('HTTP_X_FORWARDED_PROTO', None)
+    if value is not None:
+        environ['wsgi.url_scheme'] = value
+
+
+_forwarded_token = r"[!#$%&'*+.^_`|~0-9A-Za-z-]+"
+_forwarded_pair = re.compile(
+    r'\s*(%s)\s*=\s*(%s|"(?:[^"\\]|\\.)*")\s*([;,]|$)'
+    % (_forwarded_token, _forwarded_token))
+_quoted_pair = re.compile(r'\\(.)')
+
+
+def parse_forwarded(value):
+    """
+    Parse the first element of a ``Forwarded`` header (RFC 7239),
+    returning a dictionary of its (lower-cased) parameter names and
+    their unquoted values.  Parsing stops at anything malformed.
+    """
+    params = {}
+    pos = 0
+    while pos < len(value):
+        match = _forwarded_pair.match(value, pos)
+        if match is None:
+            break
+        name, param_value, separator = match.groups()
+        if param_value.startswith('"'):
+            param_value = _quoted_pair.sub(r'\1', param_value[1:-1])
+        params.setdefault(name.lower(), param_value)
+        if separator != ';':
+            break
+        pos = match.end()
+    return params
+
+
+def _forwarded_node_address(node):
+    """
+    Return the address of a ``for`` node, without its port, or None
+    if it is ``unknown`` or obfuscated.
+    """
+    if node.startswith('['):
+        return node[1:].split(']', 1)[0]
+    if node == 'unknown' or node.startswith('_'):
+        return None
+    return node.split(':', 1)[0]
+
+
+def _translate_forwarded(environ):
+    value = environ.pop('HTTP_FORWARDED', None)
+    if value is None:
+        return
+    params = parse_forwarded(value)
+    if 'for' in params:
+        address = _forwarded_node_address(params['for'])
+        if address:
+            environ['REMOTE_ADDR'] = address
+    if 'host' in params:
+        environ['HTTP_HOST'] = params['host']
+    if 'proto' in params:
+        environ['wsgi.url_scheme'] = params['proto'].lower()
+
 
 def make_prefix_middleware(
     app, global_conf, prefix='/',
     translate_forwarded_server=True,
-    force_port=None, scheme=None):
+    force_port=None, scheme=None, translate_forwarded=False):
     from paste.deploy.converters import asbool
     translate_forwarded_server = asbool(translate_forwarded_server)
+    translate_forwarded = asbool(translate_forwarded)
     return PrefixMiddleware(
         app, prefix=prefix,
         translate_forwarded_server=translate_forwarded_server,
-        force_port=force_port, scheme=scheme)
+        force_port=force_port, scheme=scheme,
+        translate_forwarded=translate_forwarded)
 
 make_prefix_middleware.__doc__ = PrefixMiddleware.__doc__
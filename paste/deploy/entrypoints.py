@@ -0,0 +1,186 @@
+# (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
+# Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
+"""Entry point lookup for ``egg:`` URIs
+
+Distributions are found with :mod:`importlib.metadata` where it is
+available.  :mod:`pkg_resources` is only imported (lazily) for
+requirement specs that are more than a plain project name, such as
+``MyApp>=1.0``, and for distributions that only it can see, such as
+eggs that were added to its working set at runtime.
+"""
+import re
+import threading
+
+try:
+    from importlib import metadata
+except ImportError:
+    try:
+        import importlib_metadata as metadata
+    except ImportError:
+        metadata = None
+
+__all__ = ['EntryPointIndex', 'get_index', 'clear_index_cache',
+           'get_distribution', 'get_entry_map', 'get_entry_info',
+           'require', 'entry_point_spec', 'normalize_spec',
+           'distribution_location']
+
+_project_name_re = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*$')
+
+
+def _pkg_resources():
+    import pkg_resources
+    return pkg_resources
+
+
+def _metadata_distribution(spec):
+    """
+    Return the :mod:`importlib.metadata` distribution for ``spec``, or
+    None if ``spec`` has to be handled by pkg_resources.
+    """
+    if metadata is None:
+        return None
+    match = _project_name_re.match(spec)
+    if match is None:
+        return None
+    try:
+        return metadata.distribution(match.group(1))
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def require(spec):
+    """
+    Make sure the distribution described by ``spec`` is available,
+    raising an error (from pkg_resources) if it isn't.
+    """
+    if _metadata_distribution(spec) is None:
+        _pkg_resources().require(spec)
+
+
+def _find_distribution(spec):
+    dist = _metadata_distribution(spec)
+    if dist is None:
+        pkg_resources = _pkg_resources()
+        pkg_resources.require(spec)
+        dist = pkg_resources.get_distribution(spec)
+    return dist
+
+
+class EntryPointIndex(object):
+    """
+    All the entry points of one distribution, indexed by group and
+    name.  Build these with :func:`get_index`, which shares one index
+    between everything that asks for the same spec.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.distribution = dist = _find_distribution(spec)
+        self.groups = groups = {}
+        if hasattr(dist, 'get_entry_map'):
+            for group, entries in dist.get_entry_map().items():
+                groups[group] = dict(entries)
+        else:
+            for entry_point in dist.entry_points:
+                groups.setdefault(entry_point.group, {}).setdefault(
+                    entry_point.name, entry_point)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.spec)
+
+    def get(self, group, name):
+        """
+        Return the entry point ``name`` in ``group``, or None.
+        """
+        entries = self.groups.get(group)
+        if entries is None:
+            return None
+        return entries.get(name)
+
+    def names(self, group):
+        return sorted(self.groups.get(group, ()))
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(spec):
+    """
+    Return the :class:`EntryPointIndex` for ``spec``, building it the
+    first time the spec is seen.
+    """
+    try:
+        return _indexes[spec]
+    except KeyError:
+        pass
+    with _indexes_lock:
+        index = _indexes.get(spec)
+        if index is None:
+            index = _indexes[spec] = EntryPointIndex(spec)
+        return index
+
+
+def clear_index_cache():
+    """
+    Forget every index built by :func:`get_index`, e.g. after
+    installing or upgrading distributions at runtime.
+    """
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def get_distribution(spec):
+    """
+    Return the distribution for ``spec``: an
+    :mod:`importlib.metadata` distribution when possible, otherwise a
+    pkg_resources one.
+    """
+    return get_index(spec).distribution
+
+
+def get_entry_map(spec, group):
+    """
+    Return a dictionary of entry point names to entry points in
+    ``group`` for the distribution ``spec``.  The entry points all
+    have a ``name`` attribute and a ``load()`` method.
+    """
+    return dict(get_index(spec).groups.get(group, {}))
+
+
+def get_entry_info(spec, group, name):
+    """
+    Return the entry point ``name`` in ``group``, or None.
+    """
+    return get_index(spec).get(group, name)
+
+
+def entry_point_spec(entry_point):
+    """
+    Return the ``module:attr`` string an entry point refers to.
+    """
+    if hasattr(entry_point, 'module_name'):
+        # pkg_resources
+        return '%s:%s' % (entry_point.module_name,
+                          '.'.join(entry_point.attrs))
+    return normalize_spec(entry_point.value)
+
+
+def normalize_spec(spec):
+    """
+    Return ``spec`` (``module:attr``, as written in an entry point or a
+    config file) without whitespace around the names and without any
+    trailing ``[extras]``.
+    """
+    spec = _extras_re.sub('', spec)
+    if ':' not in spec:
+        return spec.strip()
+    module, attr = spec.split(':', 1)
+    return '%s:%s' % (module.strip(), attr.strip())
+
+_extras_re = re.compile(r'\s*\[.*\]\s*$')
+
+
+def distribution_location(dist):
+    if hasattr(dist, 'locate_file') and not hasattr(dist, 'location'):
+        return str(dist.locate_file(''))
+    return dist.location
@@ -1,16 +1,27 @@
 # (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
 # Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
 from __future__ import with_statement
+import locale
+import mmap
 import os
 import sys
 import re
+import threading
+import warnings
 
-import pkg_resources
+from paste.deploy import entrypoints, timing
+from paste.deploy.compat import (
+    ConfigParser, SectionProxy, OrderedDict, StringIO, unquote, iteritems,
+    intern,
+    BasicInterpolation, InterpolationError, InterpolationMissingOptionError,
+    InterpolationSyntaxError, futures)
+from paste.deploy.util import CopyOnWriteDict, fix_call, lookup_object
 
-from paste.deploy.compat import ConfigParser, unquote, iteritems, dictkeys
-from paste.deploy.util import fix_call, lookup_object
-
-__all__ = ['loadapp', 'loadserver', 'loadfilter', 'appconfig']
+__all__ = ['loadapp', 'loadserver', 'loadfilter', 'appconfig',
+           'create_context', 'create_concurrently', 'load_many',
+           'LoadResult',
+           'ConfigCache', 'config_cache', 'LazyConfigFile',
+           'InstanceRegistry', 'shared_instances']
 
 
 ############################################################
@@ -19,7 +30,28 @@ __all__ = ['loadapp', 'loadserver', 'loadfilter', 'appconfig']
 
 
 def import_string(s):
-    return pkg_resources.EntryPoint.parse("x=" + s).load(False)
+    """
+    Import and return the object named by a ``module:attr`` string.
+    Like entry points, ``s`` may have whitespace around the names and
+    trailing ``[extras]``, which are ignored.
+    """
+    spec = entrypoints.normalize_spec(s)
+    try:
+        with timing.span('import', spec):
+            return lookup_object(spec)
+    except AttributeError:
+        e = sys.exc_info()[1]
+        raise ImportError("Cannot import %r: %s" % (s, e))
+
+
+def _lazy_import(s):
+    """
+    Return a function that imports the object named by ``s`` when it
+    is called.
+    """
+    def load():
+        return import_string(s)
+    return load
 
 
 def _aslist(obj):
@@ -50,23 +82,89 @@ def _flatten(lst):
 class NicerConfigParser(ConfigParser):
 
     def __init__(self, filename, *args, **kw):
+        self._interpolated_defaults = None
+        self._interpolated = {}
         ConfigParser.__init__(self, *args, **kw)
         self.filename = filename
         if hasattr(self, '_interpolation'):
-            self._interpolation = self.InterpolateWrapper(self._interpolation)
+            interpolation = self._interpolation
+            if type(interpolation) is BasicInterpolation:
+                interpolation = CompiledInterpolation()
+            self._interpolation = self.InterpolateWrapper(interpolation)
 
     read_file = getattr(ConfigParser, 'read_file', ConfigParser.readfp)
 
+    def get_state(self):
+        """
+        Return a copy of the parsed defaults and sections, suitable for
+        passing to :meth:`set_state` on another parser.
+        """
+        return (self._defaults.copy(),
+                [(section, options.copy())
+                 for section, options in iteritems(self._sections)])
+
+    def set_state(self, state):
+        """
+        Replace the contents of this parser with a state previously
+        returned by :meth:`get_state`.
+        """
+        defaults, sections = state
+        self.invalidate_defaults()
+        self._defaults.clear()
+        self._defaults.update(defaults)
+        self._sections.clear()
+        for section, options in sections:
+            self._sections[section] = options.copy()
+        if hasattr(self, '_proxies'):
+            # Python >= 3.2
+            for section, options in sections:
+                self._proxies[section] = SectionProxy(self, section)
+
+    def set_section(self, section, options):
+        """
+        Add ``section`` with the (raw) ``options``, parsed elsewhere.
+        """
+        self._sections[section] = options.copy()
+        if hasattr(self, '_proxies'):
+            # Python >= 3.2
+            self._proxies[section] = SectionProxy(self, section)
+
     def defaults(self):
         """Return the defaults, with their values interpolated (with the
         defaults dict itself)
 
         Mainly to support defaults using values such as %(here)s
+
+        The interpolated values are computed once and reused until the
+        parser changes; code that modifies ``_defaults`` directly must
+        call :meth:`invalidate_defaults`.
+        """
+        if self._interpolated_defaults is None:
+            defaults = ConfigParser.defaults(self).copy()
+            for key, val in iteritems(defaults):
+                defaults[key] = self.get('DEFAULT', key) or val
+            self._interpolated_defaults = defaults
+        return self._interpolated_defaults.copy()
+
+    def invalidate_defaults(self):
         """
-        defaults = ConfigParser.defaults(self).copy()
-        for key, val in iteritems(defaults):
-            defaults[key] = self.get('DEFAULT', key) or val
-        return defaults
+        Forget the interpolated defaults, and the interpolated values
+        of every section (which may refer to the defaults).
+        """
+        self._interpolated_defaults = None
+        self._interpolated.clear()
+
+    def _read(self, *args, **kw):
+        self.invalidate_defaults()
+        return ConfigParser._read(self, *args, **kw)
+
+    def set(self, *args, **kw):
+        self.invalidate_defaults()
+        return ConfigParser.set(self, *args, **kw)
+
+    def remove_option(self, *args, **kw):
+        self.invalidate_defaults()
+        return ConfigParser.remove_option(self, *args, **kw)
 
     def _interpolate(self, section, option, rawval, vars):
         # Python < 3.2
@@ -102,6 +200,320 @@ class NicerConfigParser(ConfigParser):
                 raise
 
 
+class CompiledInterpolation(object):
+    """
+    The interpolation of :class:`ConfigParser` (``%(name)s``
+    references to options of the same section or ``[DEFAULT]``, and
+    ``%%`` for a percent sign), with each raw value compiled once into
+    a template, and the values of every section interpolated at most
+    once until the parser changes.
+
+    A reference cycle is reported as such, naming the options
+    involved, and references may be nested deeper than the 10 levels
+    :class:`ConfigParser` allows.
+    """
+
+    _KEYCRE = re.compile(r'%\(([^)]+)\)s')
+
+    def __init__(self):
+        self._templates = {}
+
+    def compile(self, parser, section, option, value):
+        """
+        Return the template of ``value``: the value itself if it
+        contains no references, else a tuple of literal strings and
+        ``(name,)`` references.
+        """
+        template = self._templates.get(value)
+        if template is not None:
+            return template
+        if '%' not in value:
+            return value
+        parts = []
+        literal = []
+        rest = value
+        while rest:
+            p = rest.find('%')
+            if p < 0:
+                literal.append(rest)
+                break
+            if p > 0:
+                literal.append(rest[:p])
+                rest = rest[p:]
+            c = rest[1:2]
+            if c == '%':
+                literal.append('%')
+                rest = rest[2:]
+            elif c == '(':
+                m = self._KEYCRE.match(rest)
+                if m is None:
+                    raise InterpolationSyntaxError(
+                        option, section,
+                        'bad interpolation variable reference %r' % rest)
+                if literal:
+                    parts.append(''.join(literal))
+                    literal = []
+                parts.append((parser.optionxform(m.group(1)),))
+                rest = rest[m.end():]
+            else:
+                raise InterpolationSyntaxError(
+                    option, section,
+                    "'%%' must be followed by '%%' or '(', found: %r"
+                    % (rest,))
+        if literal:
+            parts.append(''.join(literal))
+        if not any(isinstance(part, tuple) for part in parts):
+            template = ''.join(parts)
+        else:
+            template = tuple(parts)
+        self._templates[value] = template
+        return template
+
+    def _memo(self, parser, section, values):
+        # Only the values of the parser itself (no ``vars``) are
+        # memoized; ``values`` is then the ChainMap made by
+        # ConfigParser._unify_values()
+        maps = getattr(values, 'maps', None)
+        if (maps is None or len(maps) != 3 or maps[0]
+                or maps[2] is not parser._defaults
+                or not hasattr(parser, '_interpolated')):
+            return {}
+        if maps[1] is not parser._sections.get(section):
+            if section != parser.default_section or maps[1]:
+                return {}
+        memo = parser._interpolated.get(section)
+        if memo is None:
+            memo = parser._interpolated[section] = {}
+        return memo
+
+    def _resolve(self, parser, section, option, value, values, memo, chain):
+        template = self.compile(parser, section, option, value)
+        if not isinstance(template, tuple):
+            return template
+        result = []
+        for part in template:
+            if not isinstance(part, tuple):
+                result.append(part)
+                continue
+            name = part[0]
+            if name in memo:
+                result.append(memo[name])
+                continue
+            try:
+                raw = values[name]
+            except KeyError:
+                raise InterpolationMissingOptionError(
+                    option, section, value, name)
+            if name in chain:
+                cycle = chain[chain.index(name):] + [name]
+                raise InterpolationError(
+                    chain[0], section,
+                    'Circular reference in section [%s]: %s'
+                    % (section, ' -> '.join(cycle)))
+            chain.append(name)
+            resolved = memo[name] = self._resolve(
+                parser, section, name, raw, values, memo, chain)
+            chain.pop()
+            result.append(resolved)
+        return ''.join(result)
+
+    def before_get(self, parser, section, option, value, values):
+        memo = self._memo(parser, section, values)
+        if option in memo:
+            return memo[option]
+        result = memo[option] = self._resolve(
+            parser, section, option, value, values, memo, [option])
+        return result
+
+    def before_set(self, parser, section, option, value):
+        try:
+            self.compile(parser, section, option, value)
+        except InterpolationSyntaxError:
+            raise ValueError('invalid interpolation syntax in %r' % value)
+        return value
+
+    def before_read(self, parser, section, option, value):
+        return value
+
+    def before_write(self, parser, section, option, value):
+        return value
+
+
+def _stat_key(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        # Raise what open() raises, which is another class on Python 2
+        e = sys.exc_info()[1]
+        raise IOError(e.errno, e.strerror, filename)
+    return (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino)
+
+
+class ConfigCache(object):
+    """
+    A process-wide cache of parsed config files.
+
+    Entries are keyed on the absolute path of the file, and are only
+    used while the file's modification time and size are unchanged.
+    At most ``maxsize`` files are kept; the least recently used entry
+    is discarded first.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stat_key(self, filename):
+        return _stat_key(filename)
+
+    def get(self, filename, key):
+        """
+        Return the parser state stored for ``filename``, or None if
+        there is none or it was stored under a different ``key``.
+        """
+        filename = os.path.abspath(filename)
+        with self._lock:
+            entry = self._entries.pop(filename, None)
+            if entry is None or entry[0] != key:
+                return None
+            self._entries[filename] = entry
+            return entry[1]
+
+    def set(self, filename, key, state):
+        if not self.maxsize:
+            return
+        filename = os.path.abspath(filename)
+        with self._lock:
+            self._entries.pop(filename, None)
+            self._entries[filename] = (key, state)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, filename=None):
+        """
+        Forget the cached state of ``filename``, or of every file if
+        no filename is given.
+        """
+        with self._lock:
+            if filename is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(filename), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LazyConfigFile(object):
+    """
+    A config file whose sections are only parsed when they are asked
+    for.
+
+    The file is scanned once (through ``mmap``) for the section
+    headers -- lines starting with ``[`` -- and the offsets of every
+    section are kept.  ``[DEFAULT]`` is parsed right away; any other
+    section is parsed the first time :meth:`options` is called for it,
+    and its options are kept for later calls.
+
+    ``key`` is the :meth:`ConfigCache.stat_key` of the file when it
+    was scanned; reading a section fails if the file changed since.
+    """
+
+    _header_re = re.compile(br'^\[(.+)\]', re.M)
+
+    def __init__(self, filename, key=None):
+        self.filename = filename
+        self.encoding = locale.getpreferredencoding(False)
+        self._lock = threading.Lock()
+        self._parsed = {}
+        if key is None:
+            key = _stat_key(filename)
+        self.key = key
+        # Section name: [(start, end), ...]
+        self._ranges = OrderedDict()
+        with open(filename, 'rb') as f:
+            self._scan(f)
+        default_ranges = self._ranges.pop('DEFAULT', [])
+        if self._preamble:
+            default_ranges.insert(0, (0, self._preamble))
+        parser = self._parse(default_ranges)
+        self._defaults = parser._defaults.copy()
+
+    def _scan(self, f):
+        size = os.fstat(f.fileno()).st_size
+        starts = []
+        if size:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for match in self._header_re.finditer(data):
+                    name = match.group(1).decode(self.encoding)
+                    starts.append((name, match.start()))
+            finally:
+                data.close()
+        if starts:
+            self._preamble = starts[0][1]
+        else:
+            self._preamble = size
+        for i, (name, start) in enumerate(starts):
+            if i + 1 < len(starts):
+                end = starts[i + 1][1]
+            else:
+                end = size
+            self._ranges.setdefault(name, []).append((start, end))
+
+    def _parse(self, ranges):
+        if _stat_key(self.filename) != self.key:
+            raise IOError(
+                'Config file %s changed while it was being loaded'
+                % self.filename)
+        chunks = []
+        with open(self.filename, 'rb') as f:
+            for start, end in ranges:
+                f.seek(start)
+                chunks.append(f.read(end - start).decode(self.encoding))
+        parser = NicerConfigParser(self.filename)
+        parser.optionxform = str
+        parser.read_file(StringIO(''.join(chunks)), self.filename)
+        return parser
+
+    @property
+    def sections(self):
+        """
+        The names of the sections (except ``[DEFAULT]``), in the order
+        they appear in the file.
+        """
+        return list(self._ranges)
+
+    def defaults(self):
+        """
+        Return the raw options of ``[DEFAULT]``.
+        """
+        return self._defaults.copy()
+
+    def options(self, section):
+        """
+        Return the raw options of ``section`` (without the defaults),
+        parsing it if it wasn't yet.
+        """
+        with self._lock:
+            options = self._parsed.get(section)
+            if options is None:
+                parser = self._parse(self._ranges[section])
+                options = self._parsed[section] = parser._sections[section]
+            return options
+
+    @property
+    def parsed(self):
+        """
+        The names of the sections parsed so far.
+        """
+        return list(self._parsed)
+
+
+config_cache = ConfigCache()
+
+
 ############################################################
 ## Object types
 ############################################################
@@ -125,14 +537,49 @@ class _ObjectType(object):
     def invoke(self, context):
         assert context.protocol in _flatten(self.egg_protocols)
         return fix_call(context.object,
-                        context.global_conf, **context.local_conf)
+                        _plain(context._global_conf), **_plain(context._local_conf))
+
+    def invoke_async(self, context):
+        """
+        Call the factory of ``context``, which uses one of the
+        asynchronous protocols, and return the awaitable it returns.
+        """
+        assert context.protocol in ASYNC_PROTOCOLS
+        return fix_call(context.object,
+                        _plain(context._global_conf), **_plain(context._local_conf))
+
+    def dependencies(self, context):
+        """
+        Return the contexts whose objects :meth:`compose` puts together
+        to make the object for ``context``, or None if the object is
+        made by calling a factory.
+        """
+        return None
+
+    def compose(self, context, objects):
+        """
+        Put together the object for ``context`` from the objects
+        created from :meth:`dependencies`.
+        """
+        raise NotImplementedError
+
+
+ASYNC_PROTOCOLS = frozenset(['paste.async_app_factory',
+                             'paste.async_filter_factory'])
+
+
+def _async_protocol_error(context):
+    return TypeError(
+        "%r uses the asynchronous protocol %r; load it with "
+        "paste.deploy.asyncload instead"
+        % (context.object, context.protocol))
 
 
 class _App(_ObjectType):
 
     name = 'application'
     egg_protocols = ['paste.app_factory', 'paste.composite_factory',
-                     'paste.composit_factory']
+                     'paste.composit_factory', 'paste.async_app_factory']
     config_prefixes = [['app', 'application'], ['composite', 'composit'],
                        'pipeline', 'filter-app']
 
@@ -140,10 +587,12 @@ class _App(_ObjectType):
         if context.protocol in ('paste.composit_factory',
                                 'paste.composite_factory'):
             return fix_call(context.object,
-                            context.loader, context.global_conf,
-                            **context.local_conf)
+                            context.loader, _plain(context._global_conf),
+                            **_plain(context._local_conf))
         elif context.protocol == 'paste.app_factory':
-            return fix_call(context.object, context.global_conf, **context.local_conf)
+            return fix_call(context.object, _plain(context._global_conf), **_plain(context._local_conf))
+        elif context.protocol == 'paste.async_app_factory':
+            raise _async_protocol_error(context)
         else:
             assert 0, "Protocol %r unknown" % context.protocol
 
@@ -152,20 +601,23 @@ APP = _App()
 
 class _Filter(_ObjectType):
     name = 'filter'
-    egg_protocols = [['paste.filter_factory', 'paste.filter_app_factory']]
+    egg_protocols = [['paste.filter_factory', 'paste.filter_app_factory',
+                      'paste.async_filter_factory']]
     config_prefixes = ['filter']
 
     def invoke(self, context):
         if context.protocol == 'paste.filter_factory':
             return fix_call(context.object,
-                            context.global_conf, **context.local_conf)
+                            _plain(context._global_conf), **_plain(context._local_conf))
         elif context.protocol == 'paste.filter_app_factory':
             def filter_wrapper(wsgi_app):
                 # This should be an object, so it has a nicer __repr__
                 return fix_call(context.object,
-                                wsgi_app, context.global_conf,
-                                **context.local_conf)
+                                wsgi_app, _plain(context._global_conf),
+                                **_plain(context._local_conf))
             return filter_wrapper
+        elif context.protocol == 'paste.async_filter_factory':
+            raise _async_protocol_error(context)
         else:
             assert 0, "Protocol %r unknown" % context.protocol
 
@@ -180,13 +632,13 @@ class _Server(_ObjectType):
     def invoke(self, context):
         if context.protocol == 'paste.server_factory':
             return fix_call(context.object,
-                            context.global_conf, **context.local_conf)
+                            _plain(context._global_conf), **_plain(context._local_conf))
         elif context.protocol == 'paste.server_runner':
             def server_wrapper(wsgi_app):
                 # This should be an object, so it has a nicer __repr__
                 return fix_call(context.object,
-                                wsgi_app, context.global_conf,
-                                **context.local_conf)
+                                wsgi_app, _plain(context._global_conf),
+                                **_plain(context._local_conf))
             return server_wrapper
         else:
             assert 0, "Protocol %r unknown" % context.protocol
@@ -200,8 +652,15 @@ class _PipeLine(_ObjectType):
     name = 'pipeline'
 
     def invoke(self, context):
-        app = context.app_context.create()
-        filters = [c.create() for c in context.filter_contexts]
+        return self.compose(
+            context, [c.create() for c in self.dependencies(context)])
+
+    def dependencies(self, context):
+        return [context.app_context] + list(context.filter_contexts)
+
+    def compose(self, context, objects):
+        app = objects[0]
+        filters = list(objects[1:])
         filters.reverse()
         for filter in filters:
             app = filter(app)
@@ -214,8 +673,14 @@ class _FilterApp(_ObjectType):
     name = 'filter_app'
 
     def invoke(self, context):
-        next_app = context.next_context.create()
-        filter = context.filter_context.create()
+        return self.compose(
+            context, [c.create() for c in self.dependencies(context)])
+
+    def dependencies(self, context):
+        return [context.next_context, context.filter_context]
+
+    def compose(self, context, objects):
+        next_app, filter = objects
         return filter(next_app)
 
 FILTER_APP = _FilterApp()
@@ -225,8 +690,14 @@ class _FilterWith(_App):
     name = 'filtered_with'
 
     def invoke(self, context):
-        filter = context.filter_context.create()
-        filtered = context.next_context.create()
+        return self.compose(
+            context, [c.create() for c in self.dependencies(context)])
+
+    def dependencies(self, context):
+        return [context.filter_context, context.next_context]
+
+    def compose(self, context, objects):
+        filter, filtered = objects
         if context.next_context.object_type is APP:
             return filter(filtered)
         else:
@@ -265,15 +736,247 @@ _loaders = {}
 
 
 def loadobj(object_type, uri, name=None, relative_to=None,
-            global_conf=None):
-    context = loadcontext(
-        object_type, uri, name=name, relative_to=relative_to,
-        global_conf=global_conf)
+            global_conf=None, shared=False, workers=None,
+            resolution_cache=None):
+    """
+    Load and create an object.  If ``shared`` is true, every section
+    is only instantiated once per process (per effective
+    configuration), and a section referenced again -- from another
+    pipeline, composite or a later ``loadobj`` call -- gets the same
+    object.  ``shared`` may also be an :class:`InstanceRegistry` to
+    share objects in.
+
+    If ``workers`` is given, the independent objects of pipelines,
+    ``filter-app`` and ``filter-with`` sections are created
+    concurrently on a pool of that many threads (see
+    :func:`create_concurrently`).  This needs :mod:`concurrent.futures`
+    (on Python 2, the ``futures`` backport).
+
+    ``resolution_cache`` is a directory (or a
+    :class:`paste.deploy.plan.ResolutionCache`) in which to keep the
+    resolved configuration of ``config:`` URIs between processes; it
+    defaults to the ``PASTE_DEPLOY_RESOLUTION_CACHE`` environment
+    variable.  While none of the config files involved change, loads
+    then skip parsing the files and looking up entry points.
+    """
+    if workers:
+        _require_futures('workers')
+    tracer = timing.environ_trace()
+    if tracer is not None:
+        with tracer as load_trace:
+            try:
+                return loadobj(object_type, uri, name=name,
+                               relative_to=relative_to,
+                               global_conf=global_conf, shared=shared,
+                               workers=workers,
+                               resolution_cache=resolution_cache)
+            finally:
+                filename = os.environ[timing.ENVIRON_KEY]
+                try:
+                    load_trace.write_chrome_trace(filename)
+                except (IOError, OSError):
+                    # Tracing mustn't replace the result or the error
+                    # of the load
+                    warnings.warn('Could not write the load trace to %s: %s'
+                                  % (filename, sys.exc_info()[1]),
+                                  RuntimeWarning)
+    if resolution_cache is None:
+        resolution_cache = os.environ.get('PASTE_DEPLOY_RESOLUTION_CACHE')
+    if resolution_cache:
+        from paste.deploy.plan import ResolutionCache
+        if not isinstance(resolution_cache, ResolutionCache):
+            resolution_cache = ResolutionCache(resolution_cache)
+        context = resolution_cache.load_context(
+            object_type, uri, name=name, relative_to=relative_to,
+            global_conf=global_conf)
+    else:
+        context = loadcontext(
+            object_type, uri, name=name, relative_to=relative_to,
+            global_conf=global_conf)
+    return create_context(context, shared=shared, workers=workers)
+
+
+def _require_futures(what):
+    if futures is None:
+        raise RuntimeError(
+            '%s needs concurrent.futures (Python 3, or the "futures" '
+            'backport on Python 2)' % what)
+
+
+def create_context(context, shared=False, workers=None):
+    """
+    Create the object for a context, with the ``shared`` and
+    ``workers`` options of :func:`loadobj`.
+    """
+    if shared is True:
+        shared = shared_instances
+    if not isinstance(shared, InstanceRegistry):
+        shared = None
+    if workers:
+        _require_futures('workers')
+        executor = futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            return create_concurrently(context, executor, registry=shared)
+        finally:
+            executor.shutdown(wait=True)
+    if shared is not None:
+        return shared.create(context)
     return context.create()
 
 
+def create_concurrently(context, executor, registry=None):
+    """
+    Create the object for ``context``, submitting every factory call in
+    its graph to ``executor`` (a :mod:`concurrent.futures` executor)
+    and putting the results together as they finish.  Pipelines,
+    ``filter-app`` and ``filter-with`` are walked; everything else
+    (including composites, which load their own apps) is created by a
+    single task.
+    """
+    pending = {}
+    # Record the spans of the tasks in the caller's trace
+    load_trace = timing.active()
+
+    def submit(ctx):
+        dependencies = ctx.object_type.dependencies(ctx)
+        if dependencies is None:
+            pending[id(ctx)] = executor.submit(
+                timing.call_in, load_trace, _create_in, ctx, registry)
+        else:
+            for dependency in dependencies:
+                submit(dependency)
+
+    def assemble(ctx):
+        dependencies = ctx.object_type.dependencies(ctx)
+        if dependencies is None:
+            return pending[id(ctx)].result()
+        return ctx.object_type.compose(
+            ctx, [assemble(dependency) for dependency in dependencies])
+
+    submit(context)
+    return assemble(context)
+
+
+def _create_in(context, registry):
+    if registry is None:
+        return context.create()
+    return registry.create(context)
+
+
+class LoadResult(object):
+    """
+    The outcome of loading one URI with :func:`load_many`: ``object``
+    is the loaded object, or ``error`` the exception raised while
+    loading it (the other one is None).
+    """
+
+    def __init__(self, uri, object=None, error=None):
+        self.uri = uri
+        self.object = object
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return '<%s %s error=%r>' % (
+                self.__class__.__name__, self.uri, self.error)
+        return '<%s %s %r>' % (self.__class__.__name__, self.uri, self.object)
+
+    def get(self):
+        """
+        Return the loaded object, or raise the error.
+        """
+        if self.error is not None:
+            raise self.error
+        return self.object
+
+
+def load_many(uris, object_type=APP, workers=None, executor=None,
+              relative_to=None, global_conf=None, shared=False):
+    """
+    Load the object of every URI in ``uris`` (apps by default)
+    concurrently, and return an ordered dictionary mapping each URI to
+    its :class:`LoadResult`.  An error loading one URI is kept in its
+    result and doesn't affect the others.
+
+    URIs are loaded on ``executor`` (a :mod:`concurrent.futures`
+    executor), or else on a pool of ``workers`` threads made for the
+    call; on Python 2 this needs the ``futures`` backport.  With
+    threads, the loads share the parsed config files
+    (:data:`config_cache`) and entry point indexes, and with
+    ``shared`` the created objects (see :func:`loadobj`).  Each load
+    uses its own loaders and parsers; the shared caches are locked,
+    and the URI schemes in ``_loaders`` are only registered at import
+    time.
+
+    With a ``ProcessPoolExecutor``, the worker processes only resolve
+    the configurations -- parsing files and looking up entry points --
+    and return :class:`~paste.deploy.plan.ContextPlan` objects, from
+    which the objects are created in the calling process, since WSGI
+    apps generally can't be sent between processes.
+    """
+    _require_futures('load_many')
+    own_executor = executor is None
+    if own_executor:
+        executor = futures.ThreadPoolExecutor(max_workers=workers)
+    in_processes = isinstance(executor, futures.ProcessPoolExecutor)
+    load_trace = timing.active()
+    try:
+        pending = OrderedDict()
+        for uri in uris:
+            if uri in pending:
+                continue
+            if in_processes:
+                pending[uri] = executor.submit(
+                    _load_plan, object_type.name, uri, relative_to,
+                    global_conf)
+            else:
+                pending[uri] = executor.submit(
+                    timing.call_in, load_trace, loadobj, object_type, uri,
+                    relative_to=relative_to, global_conf=global_conf,
+                    shared=shared)
+        results = OrderedDict()
+        for uri, future in iteritems(pending):
+            try:
+                obj = future.result()
+                if in_processes:
+                    obj = obj.create(shared=shared)
+            except Exception:
+                results[uri] = LoadResult(uri, error=sys.exc_info()[1])
+            else:
+                results[uri] = LoadResult(uri, object=obj)
+        return results
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def _load_plan(object_type_name, uri, relative_to, global_conf):
+    # Runs in worker processes of load_many(); the object type is
+    # passed by name, as the unpickled object wouldn't be APP etc.
+    from paste.deploy.plan import _object_types, loadplan
+    return loadplan(_object_types[object_type_name], uri,
+                    relative_to=relative_to, global_conf=global_conf)
+
+
 def loadcontext(object_type, uri, name=None, relative_to=None,
                 global_conf=None):
+    uri, scheme, path, name = split_uri(uri, name)
+    if scheme not in _loaders:
+        raise LookupError(
+            "URI scheme not known: %r (from %s)"
+            % (scheme, ', '.join(_loaders.keys())))
+    return _loaders[scheme](
+        object_type,
+        uri, path, name=name, relative_to=relative_to,
+        global_conf=global_conf)
+
+
+def split_uri(uri, name=None):
+    """
+    Split ``uri`` into ``(uri, scheme, path, name)``, where ``uri``
+    has its ``#name`` fragment (if any) removed.  ``name`` overrides
+    the fragment, and defaults to ``'main'``.
+    """
     if '#' in uri:
         if name is None:
             uri, name = uri.split('#', 1)
@@ -285,19 +988,24 @@ def loadcontext(object_type, uri, name=None, relative_to=None,
     if ':' not in uri:
         raise LookupError("URI has no scheme: %r" % uri)
     scheme, path = uri.split(':', 1)
-    scheme = scheme.lower()
-    if scheme not in _loaders:
-        raise LookupError(
-            "URI scheme not known: %r (from %s)"
-            % (scheme, ', '.join(_loaders.keys())))
-    return _loaders[scheme](
-        object_type,
-        uri, path, name=name, relative_to=relative_to,
-        global_conf=global_conf)
+    return uri, scheme.lower(), path, name
 
 
 def _loadconfig(object_type, uri, path, name, relative_to,
                 global_conf):
+    path = config_path(uri, path, relative_to)
+    loader = ConfigLoader(path)
+    if global_conf:
+        loader.update_defaults(global_conf, overwrite=False)
+    return loader.get_context(object_type, name, global_conf)
+
+_loaders['config'] = _loadconfig
+
+
+def config_path(uri, path, relative_to):
+    """
+    Return the filename that the path of a ``config:`` URI refers to.
+    """
     isabs = os.path.isabs(path)
     # De-Windowsify the paths:
     path = path.replace('\\', '/')
@@ -313,13 +1021,7 @@ def _loadconfig(object_type, uri, path, name, relative_to,
             path = relative_to + '/' + path
     if path.startswith('///'):
         path = path[2:]
-    path = unquote(path)
-    loader = ConfigLoader(path)
-    if global_conf:
-        loader.update_defaults(global_conf, overwrite=False)
-    return loader.get_context(object_type, name, global_conf)
-
-_loaders['config'] = _loadconfig
+    return unquote(path)
 
 
 def _loadegg(object_type, uri, spec, name, relative_to,
@@ -380,9 +1082,71 @@ class _Loader(object):
         return self._absolute_re.search(name)
 
 
+# While resolving with record_files(), the config files that were read
+_resolve_state = threading.local()
+
+
+class _FileRecording(object):
+    """
+    While in the ``with`` block, records the config files read by this
+    thread in ``reads``, as ``(filename, stat_key)`` where ``stat_key``
+    is the :meth:`ConfigCache.stat_key` of the file that was parsed.
+    Recordings can be nested; the outer one gets the reads of the
+    inner one too, even if the block fails.
+    """
+
+    def __init__(self):
+        self.reads = []
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_resolve_state, 'files', None)
+        _resolve_state.files = self.reads
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _resolve_state.files = self._previous
+        if self._previous is not None:
+            self._previous.extend(self.reads)
+
+    @property
+    def files(self):
+        return [filename for filename, key in self.reads]
+
+
+def record_files(func, *args, **kw):
+    """
+    Call ``func(*args, **kw)`` and return ``(result, files)``, where
+    ``files`` lists the config files that were read (by this thread)
+    during the call.
+    """
+    with _FileRecording() as recording:
+        result = func(*args, **kw)
+    return result, recording.files
+
+
 class ConfigLoader(_Loader):
 
-    def __init__(self, filename):
+    # If set, files larger than this (in bytes) are loaded lazily
+    # unless lazy=False is given; lazy loading is off by default
+    lazy_threshold = None
+
+    def __init__(self, filename, cache=None, lazy=None):
+        """
+        Parse ``filename``.  The parsed result is shared through
+        ``cache`` (by default the process-wide :data:`config_cache`),
+        so loading the same unchanged file again doesn't re-parse it;
+        pass ``cache=False`` to always read the file.
+
+        With ``lazy=True`` only ``[DEFAULT]`` is parsed up front, and
+        every other section when it is first needed (see
+        :class:`LazyConfigFile`), so loading an app only parses the
+        sections it refers to through ``use``, ``pipeline``, ``next``
+        and ``filter-with``.  Sections that are never loaded aren't
+        checked for errors, and ``self.parser`` only holds the sections
+        parsed so far.  By default files are parsed completely, unless
+        :attr:`lazy_threshold` is set and the file is larger.
+        """
         self.filename = filename = filename.strip()
         defaults = {
             'here': os.path.dirname(os.path.abspath(filename)),
@@ -390,28 +1154,129 @@ class ConfigLoader(_Loader):
             }
         self.parser = NicerConfigParser(filename, defaults=defaults)
         self.parser.optionxform = str  # Don't lower-case keys
-        with open(filename) as f:
+        self._section_index = None
+        # Contexts of "use = ..." targets, by (object_type, use,
+        # global_conf): (context, files read resolving it)
+        self._use_contexts = {}
+        # Shared bases of the global configuration of sections, by the
+        # global_conf they were resolved with
+        self._global_bases = {}
+        self._global_base_ids = set()
+        if cache is None:
+            cache = config_cache
+        self.lazy = None
+        self.stat_key = None
+        try:
+            if lazy is None:
+                lazy = (self.lazy_threshold is not None
+                        and _stat_key(filename)[1] > self.lazy_threshold)
+            with timing.span('parse', filename) as span:
+                if lazy:
+                    cached = self._read_lazy(cache)
+                else:
+                    cached = self._read(cache)
+                if span is not None:
+                    span.args['cached'] = cached
+        finally:
+            # Recorded even if reading failed, so a reloading app
+            # watches the file that broke it
+            files_read = getattr(_resolve_state, 'files', None)
+            if files_read is not None:
+                files_read.append((os.path.abspath(filename), self.stat_key))
+
+    def _read(self, cache):
+        """
+        Fill the parser from ``cache`` or the file; returns true if the
+        cache was used.
+        """
+        if cache is False:
+            self.stat_key = _stat_key(self.filename)
+            with open(self.filename) as f:
+                self.parser.read_file(f)
+            return False
+        key = self.stat_key = cache.stat_key(self.filename)
+        state = cache.get(self.filename, key)
+        if state is not None and not isinstance(state, LazyConfigFile):
+            self.parser.set_state(state)
+            return True
+        with open(self.filename) as f:
             self.parser.read_file(f)
+        cache.set(self.filename, key, self.parser.get_state())
+        return False
+
+    def _read_lazy(self, cache):
+        """
+        Scan the file (or take the scan from ``cache``) and fill the
+        parser with its defaults; returns true if the cache was used.
+        """
+        cached = False
+        if cache is False:
+            self.lazy = LazyConfigFile(self.filename)
+        else:
+            key = cache.stat_key(self.filename)
+            state = cache.get(self.filename, key)
+            if isinstance(state, LazyConfigFile):
+                self.lazy = state
+                cached = True
+            else:
+                self.lazy = LazyConfigFile(self.filename, key)
+                cache.set(self.filename, key, self.lazy)
+        self.stat_key = self.lazy.key
+        self.parser._defaults.update(self.lazy.defaults())
+        self.parser.invalidate_defaults()
+        return cached
+
+    def _parse_section(self, section):
+        """
+        Make sure ``section`` is in the parser, when loading lazily.
+        """
+        if self.lazy is not None and not self.parser.has_section(section):
+            self.parser.set_section(section, self.lazy.options(section))
 
     def update_defaults(self, new_defaults, overwrite=True):
         for key, value in iteritems(new_defaults):
             if not overwrite and key in self.parser._defaults:
                 continue
             self.parser._defaults[key] = value
+        self.parser.invalidate_defaults()
+        self._use_contexts.clear()
+        self._global_bases.clear()
+        self._global_base_ids.clear()
 
     def get_context(self, object_type, name=None, global_conf=None):
+        with timing.span('resolve',
+                         lambda: '%s#%s' % (self.filename, name or 'main'),
+                         object_type=object_type.name):
+            return self._get_context(object_type, name, global_conf)
+
+    def _get_context(self, object_type, name, global_conf):
         if self.absolute_name(name):
             return loadcontext(object_type, name,
                                relative_to=os.path.dirname(self.filename),
                                global_conf=global_conf)
         section = self.find_config_section(
             object_type, name=name)
-        if global_conf is None:
-            global_conf = {}
-        else:
-            global_conf = global_conf.copy()
-        defaults = self.parser.defaults()
-        global_conf.update(defaults)
+        chain = getattr(_resolve_state, 'chain', None)
+        if chain is None:
+            chain = _resolve_state.chain = []
+        link = (os.path.abspath(self.filename), section)
+        if link in chain:
+            cycle = chain[chain.index(link):] + [link]
+            raise LookupError(
+                "Circular reference: %s"
+                % ' -> '.join('[%s] in %s' % (section, filename)
+                              for filename, section in cycle))
+        chain.append(link)
+        try:
+            return self._section_context(
+                object_type, section, name, global_conf)
+        finally:
+            chain.pop()
+
+    def _section_context(self, object_type, section, name, global_conf):
+        self._parse_section(section)
+        global_conf = self._global_conf(global_conf)
+        defaults = self.parser._defaults
         local_conf = {}
         global_additions = {}
         get_from_globals = {}
@@ -427,7 +1292,7 @@ class ConfigLoader(_Loader):
                 if option in defaults:
                     # @@: It's a global option (?), so skip it
                     continue
-                local_conf[option] = self.parser.get(section, option)
+                local_conf[intern(option)] = self.parser.get(section, option)
         for local_var, glob_var in get_from_globals.items():
             local_conf[local_var] = global_conf[glob_var]
         if object_type in (APP, FILTER) and 'filter-with' in local_conf:
@@ -436,7 +1301,7 @@ class ConfigLoader(_Loader):
             filter_with = None
         if 'require' in local_conf:
             for spec in local_conf['require'].split():
-                pkg_resources.require(spec)
+                entrypoints.require(spec)
             del local_conf['require']
         if section.startswith('filter-app:'):
             context = self._filter_app_context(
@@ -466,19 +1331,63 @@ class ConfigLoader(_Loader):
             filter_with_context.filter_context = self.filter_context(
                 name=filter_with, global_conf=global_conf)
             filter_with_context.next_context = context
+            filter_with_context.section = section
             return filter_with_context
+        context.section = section
         return context
 
+    def _conf_key(self, global_conf):
+        """
+        Return a hashable key for the contents of ``global_conf``, or
+        None if it has unhashable values.  The key of an unchanged
+        layer over one of our shared bases is the id of the base.
+        """
+        if isinstance(global_conf, CopyOnWriteDict):
+            if (not global_conf.changed
+                and id(global_conf.base) in self._global_base_ids):
+                return id(global_conf.base)
+            global_conf = global_conf.todict()
+        elif global_conf is None:
+            global_conf = {}
+        try:
+            key = frozenset(iteritems(global_conf))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _global_conf(self, global_conf):
+        """
+        Return the global configuration for a section: ``global_conf``
+        updated with the defaults of this file, as a
+        :class:`~paste.deploy.util.CopyOnWriteDict` over a base shared
+        by every section resolved with the same ``global_conf``.
+        """
+        key = self._conf_key(global_conf)
+        if isinstance(key, int):
+            # Already one of ours; adding the defaults changes nothing
+            return CopyOnWriteDict(global_conf.base)
+        if global_conf is None:
+            global_conf = {}
+        base = self._global_bases.get(key)
+        if base is None:
+            base = dict((intern(name), value)
+                        for name, value in iteritems(global_conf))
+            base.update(self.parser.defaults())
+            if key is not None:
+                self._global_bases[key] = base
+                self._global_base_ids.add(id(base))
+        return CopyOnWriteDict(base)
+
     def _context_from_use(self, object_type, local_conf, global_conf,
                           global_additions, section):
         use = local_conf.pop('use')
-        context = self.get_context(
-            object_type, name=use, global_conf=global_conf)
-        context.global_conf.update(global_additions)
-        context.local_conf.update(local_conf)
+        context = self._use_context(object_type, use, global_conf)
+        context._global_conf.update(global_additions)
+        context._local_conf.update(local_conf)
         if '__file__' in global_conf:
             # use sections shouldn't overwrite the original __file__
-            context.global_conf['__file__'] = global_conf['__file__']
+            context._global_conf['__file__'] = global_conf['__file__']
         # @@: Should loader be overwritten?
         context.loader = self
 
@@ -497,6 +1406,30 @@ class ConfigLoader(_Loader):
 
         return context
 
+    def _use_context(self, object_type, use, global_conf):
+        """
+        Return (a copy of) the context of the ``use`` target.  Targets
+        are only resolved once per loader and global configuration,
+        however many sections use them.
+        """
+        conf_key = self._conf_key(global_conf)
+        if conf_key is None:
+            return self.get_context(
+                object_type, name=use, global_conf=global_conf)
+        key = (object_type, use, conf_key)
+        try:
+            context, reads = self._use_contexts[key]
+        except KeyError:
+            with _FileRecording() as recording:
+                context = self.get_context(
+                    object_type, name=use, global_conf=global_conf)
+            self._use_contexts[key] = (context, recording.reads)
+        else:
+            files_read = getattr(_resolve_state, 'files', None)
+            if files_read is not None:
+                files_read.extend(reads)
+        return context.copy()
+
     def _context_from_explicit(self, object_type, local_conf, global_conf,
                                global_addition, section):
         possible = []
@@ -514,10 +1447,11 @@ class ConfigLoader(_Loader):
                 "No loader given in section %r" % section)
         found_protocol, found_expr = possible[0]
         del local_conf[found_protocol]
-        value = import_string(found_expr)
         context = LoaderContext(
-            value, object_type, found_protocol,
-            global_conf, local_conf, self)
+            None, object_type, found_protocol,
+            global_conf, local_conf, self,
+            object_spec=entrypoints.normalize_spec(found_expr),
+            object_loader=_lazy_import(found_expr))
         return context
 
     def _filter_app_context(self, object_type, section, name,
@@ -572,10 +1506,14 @@ class ConfigLoader(_Loader):
         Case is *not* ignored.
         """
         possible = []
+        index = self.section_index()
         for name_options in object_type.config_prefixes:
             for name_prefix in name_options:
-                found = self._find_sections(
-                    self.parser.sections(), name_prefix, name)
+                if name is None:
+                    found = (index.get((name_prefix, None), [])
+                             + index.get((name_prefix, 'main'), []))
+                else:
+                    found = index.get((name_prefix, name))
                 if found:
                     possible.extend(found)
                     break
@@ -594,69 +1532,112 @@ class ConfigLoader(_Loader):
                    self.filename))
         return possible[0]
 
-    def _find_sections(self, sections, name_prefix, name):
-        found = []
-        if name is None:
-            if name_prefix in sections:
-                found.append(name_prefix)
-            name = 'main'
-        for section in sections:
-            if section.startswith(name_prefix + ':'):
-                if section[len(name_prefix) + 1:].strip() == name:
-                    found.append(section)
-        return found
+    def section_index(self):
+        """
+        Return a dictionary mapping ``(prefix, name)`` to the list of
+        sections named ``[prefix:name]`` (the name is stripped), in the
+        order they appear in the file.  Sections without a prefix are
+        indexed as ``(section, None)``.
+        """
+        if self._section_index is None:
+            index = {}
+            if self.lazy is not None:
+                sections = self.lazy.sections
+            else:
+                sections = self.parser.sections()
+            for section in sections:
+                index.setdefault((section, None), []).append(section)
+                if ':' in section:
+                    prefix, section_name = section.split(':', 1)
+                    index.setdefault(
+                        (prefix, section_name.strip()), []).append(section)
+            self._section_index = index
+        return self._section_index
 
 
 class EggLoader(_Loader):
 
     def __init__(self, spec):
         self.spec = spec
+        self._index = None
+
+    @property
+    def index(self):
+        """
+        The entry point index of the distribution, shared with every
+        other ``EggLoader`` for the same spec.
+        """
+        if self._index is None:
+            self._index = entrypoints.get_index(self.spec)
+        return self._index
 
     def get_context(self, object_type, name=None, global_conf=None):
         if self.absolute_name(name):
             return loadcontext(object_type, name,
                                global_conf=global_conf)
-        entry_point, protocol, ep_name = self.find_egg_entry_point(
+        with timing.span('resolve',
+                         lambda: 'egg:%s#%s' % (self.spec, name or 'main'),
+                         object_type=object_type.name):
+            return self._get_context(object_type, name, global_conf)
+
+    def _get_context(self, object_type, name, global_conf):
+        entry, protocol, ep_name = self.find_egg_entry(
             object_type, name=name)
         return LoaderContext(
-            entry_point,
+            None,
             object_type,
             protocol,
             global_conf or {}, {},
             self,
-            distribution=pkg_resources.get_distribution(self.spec),
-            entry_point_name=ep_name)
+            distribution=self.index.distribution,
+            entry_point_name=ep_name,
+            object_spec=entrypoints.entry_point_spec(entry),
+            object_loader=self._entry_loader(entry, protocol))
+
+    def _entry_loader(self, entry, protocol):
+        def load():
+            with timing.span('import',
+                             lambda: '%s#%s' % (self.spec, entry.name),
+                             protocol=protocol):
+                return entry.load()
+        return load
 
     def find_egg_entry_point(self, object_type, name=None):
         """
-        Returns the (entry_point, protocol) for the with the given
-        ``name``.
+        Returns the (entry_point, protocol, name) for the entry point
+        with the given ``name``; the entry point is loaded.
+        """
+        entry, protocol, ep_name = self.find_egg_entry(
+            object_type, name=name)
+        return self._entry_loader(entry, protocol)(), protocol, ep_name
+
+    def find_egg_entry(self, object_type, name=None):
+        """
+        Like :meth:`find_egg_entry_point`, but returns the entry point
+        itself, without loading (importing) it.
         """
         if name is None:
             name = 'main'
+        index = self.index
         possible = []
         for protocol_options in object_type.egg_protocols:
             for protocol in protocol_options:
-                pkg_resources.require(self.spec)
-                entry = pkg_resources.get_entry_info(
-                    self.spec,
-                    protocol,
-                    name)
+                entry = index.get(protocol, name)
                 if entry is not None:
-                    possible.append((entry.load(), protocol, entry.name))
+                    possible.append((entry, protocol, entry.name))
                     break
         if not possible:
             # Better exception
-            dist = pkg_resources.get_distribution(self.spec)
+            names = _flatten([
+                index.names(prot)
+                for prot in _flatten(object_type.egg_protocols)])
             raise LookupError(
                 "Entry point %r not found in egg %r (dir: %s; protocols: %s; "
                 "entry_points: %s)"
                 % (name, self.spec,
-                   dist.location,
+                   entrypoints.distribution_location(index.distribution),
                    ', '.join(_flatten(object_type.egg_protocols)),
-                   ', '.join(_flatten([
-                dictkeys(pkg_resources.get_entry_info(self.spec, prot, name) or {})
-                for prot in protocol_options] or '(no entry points)'))))
+                   ', '.join(names) or '(no entry points)'))
         if len(possible) > 1:
             raise LookupError(
                 "Ambiguous entry points for %r in egg %r (protocols: %s)"
@@ -678,23 +1659,34 @@ class FuncLoader(_Loader):
             raise LookupError("Configuration not in format module:function")
 
     def get_context(self, object_type, name=None, global_conf=None):
-        obj = lookup_object(self.spec)
         return LoaderContext(
-            obj,
+            None,
             object_type,
             None, # determine protocol from section type
             global_conf or {},
             {},
             self,
+            object_spec=self.spec,
+            object_loader=self._load_object,
             )
 
+    def _load_object(self):
+        with timing.span('import', self.spec):
+            return lookup_object(self.spec)
+
 
 class LoaderContext(object):
 
     def __init__(self, obj, object_type, protocol,
                  global_conf, local_conf, loader,
-                 distribution=None, entry_point_name=None):
-        self.object = obj
+                 distribution=None, entry_point_name=None, section=None,
+                 object_spec=None, object_loader=None):
+        self._object = obj
+        # Called (without arguments) to import the object when it is
+        # first needed, if obj is None
+        self._object_loader = object_loader
+        # The "module:attr" that obj was imported from, if known
+        self.object_spec = object_spec
         self.object_type = object_type
         self.protocol = protocol
         #assert protocol in _flatten(object_type.egg_protocols), (
@@ -705,9 +1697,95 @@ class LoaderContext(object):
         self.loader = loader
         self.distribution = distribution
         self.entry_point_name = entry_point_name
+        self.section = section
+
+    def __repr__(self):
+        return '<%s %s %s>' % (self.__class__.__name__,
+                               self.object_type.name, self.describe())
+
+    def _get_object(self):
+        if self._object is None and self._object_loader is not None:
+            self._object = self._object_loader()
+            self._object_loader = None
+        return self._object
+
+    def _set_object(self, obj):
+        self._object = obj
+        self._object_loader = None
+
+    object = property(_get_object, _set_object, doc="""
+        The factory (or other object) of this context.  Factories found
+        by loaders are only imported when this is first used, usually
+        by :meth:`create`.""")
+
+    def _get_global_conf(self):
+        conf = self._global_conf
+        if isinstance(conf, CopyOnWriteDict):
+            conf = self._global_conf = conf.todict()
+        return conf
+
+    def _set_global_conf(self, conf):
+        self._global_conf = conf
+
+    global_conf = property(_get_global_conf, _set_global_conf, doc="""
+        The global configuration, as a dictionary.  Loaders may keep it
+        layered over a base shared with other contexts until it is
+        first used.""")
+
+    def _get_local_conf(self):
+        conf = self._local_conf
+        if isinstance(conf, CopyOnWriteDict):
+            conf = self._local_conf = conf.todict()
+        return conf
+
+    def _set_local_conf(self, conf):
+        self._local_conf = conf
+
+    local_conf = property(_get_local_conf, _set_local_conf, doc="""
+        The local configuration of the section, as a dictionary.""")
+
+    @property
+    def object_loaded(self):
+        """
+        False if the object still has to be imported.
+        """
+        return self._object_loader is None
+
+    def copy(self):
+        """
+        Return a copy with its own ``global_conf`` and ``local_conf``;
+        the object and any child contexts are shared.  The copy's
+        configuration is layered over this context's, which must not
+        be changed afterwards.
+        """
+        context = self.__class__.__new__(self.__class__)
+        context.__dict__.update(self.__dict__)
+        context._global_conf = _layered(self._global_conf)
+        context._local_conf = _layered(self._local_conf)
+        return context
+
+    def describe(self):
+        """
+        A short description of where this context came from, for
+        messages and timings.
+        """
+        if self.section is not None:
+            if getattr(self.loader, 'filename', None):
+                return '[%s] in %s' % (self.section, self.loader.filename)
+            return '[%s]' % self.section
+        if self.entry_point_name is not None:
+            return 'entry point %s' % self.entry_point_name
+        if self.object_spec:
+            return self.object_spec
+        return repr(self._object)
 
     def create(self):
-        return self.object_type.invoke(self)
+        with timing.span('create', self.describe,
+                         object_type=self.object_type.name):
+            registry = getattr(_create_state, 'registry', None)
+            if registry is not None and self.object is not None:
+                return registry.get_or_create(self)
+            return self.object_type.invoke(self)
 
     def config(self):
         conf = AttrDict(self.global_conf)
@@ -718,8 +1796,115 @@ class LoaderContext(object):
         return conf
 
 
+def _plain(conf):
+    """
+    Return ``conf`` as a new plain dictionary, as factories get it.
+    """
+    if isinstance(conf, CopyOnWriteDict):
+        return conf.todict()
+    return dict(conf)
+
+
+def _layered(conf):
+    """
+    Return a copy-on-write copy of ``conf``.
+    """
+    if isinstance(conf, CopyOnWriteDict):
+        return conf.copy()
+    return CopyOnWriteDict(conf)
+
+
 class AttrDict(dict):
     """
     A dictionary that can be assigned to.
     """
     pass
+
+_create_state = threading.local()
+
+
+class InstanceRegistry(object):
+    """
+    Objects created by shared loads (``loadobj(..., shared=True)``).
+
+    Objects are keyed on the object type, protocol and factory of the
+    context they were created from, plus its global and local
+    configuration, so a section is only created again if its effective
+    configuration differs.  Contexts with unhashable configuration
+    values are never shared.
+
+    Each object is only created once, even when several threads ask
+    for it at the same time; the others wait for the first one to
+    finish (and try themselves if it failed).
+    """
+
+    def __init__(self):
+        self._instances = {}
+        # Objects being created, by key: (thread ident, threading.Event)
+        self._creating = {}
+        self._lock = threading.Lock()
+
+    def key(self, context):
+        try:
+            key = (context.object_type.name, context.protocol,
+                   context.object,
+                   frozenset(iteritems(context._global_conf)),
+                   frozenset(iteritems(context._local_conf)))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def create(self, context):
+        """
+        Create ``context``, sharing every object created along the way
+        (including by composites through their loader) through this
+        registry.
+        """
+        previous = getattr(_create_state, 'registry', None)
+        _create_state.registry = self
+        try:
+            return context.create()
+        finally:
+            _create_state.registry = previous
+
+    def get_or_create(self, context):
+        key = self.key(context)
+        if key is None:
+            return context.object_type.invoke(context)
+        ident = threading.current_thread().ident
+        while True:
+            with self._lock:
+                try:
+                    return self._instances[key]
+                except KeyError:
+                    pass
+                creating = self._creating.get(key)
+                if creating is None:
+                    done = threading.Event()
+                    self._creating[key] = (ident, done)
+                    break
+            owner, done = creating
+            if owner == ident:
+                # The factory asked for its own object (through a
+                # composite); waiting for it would never end
+                return context.object_type.invoke(context)
+            done.wait()
+        try:
+            obj = context.object_type.invoke(context)
+            with self._lock:
+                self._instances[key] = obj
+        finally:
+            with self._lock:
+                del self._creating[key]
+            done.set()
+        return obj
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+    def __len__(self):
+        return len(self._instances)
+
+shared_instances = InstanceRegistry()
@@ -0,0 +1,417 @@
+# (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
+# Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
+"""Resolved configurations as plain data
+
+A :class:`ContextPlan` holds everything needed to create the object
+for a :class:`~paste.deploy.loadwsgi.LoaderContext` -- the object
+type, protocol, the ``module:attr`` of the factory and the final
+global and local configuration, recursively for pipelines and
+filters -- but no parser, loader or imported objects.  Plans can be
+pickled, which lets a pre-fork server resolve its configuration once
+and have each worker only run the factories::
+
+    plan = loadplan(APP, 'config:production.ini')   # in the master
+    ...
+    app = plan.create()                              # in each worker
+
+:class:`ResolutionCache` keeps plans on disk, so processes loading an
+unchanged configuration can skip parsing it.
+"""
+from __future__ import with_statement
+import hashlib
+import json
+import os
+import tempfile
+
+from paste.deploy.compat import basestring, iteritems
+from paste.deploy.loadwsgi import (
+    APP, FILTER, SERVER, PIPELINE, FILTER_APP, FILTER_WITH,
+    ConfigLoader, EggLoader, FuncLoader, LoaderContext, _Loader,
+    _FileRecording, _lazy_import, _stat_key, loadcontext, split_uri,
+    config_path, create_context)
+
+__all__ = ['ContextPlan', 'ResolutionCache', 'loadplan']
+
+_object_types = dict((object_type.name, object_type) for object_type in
+                     (APP, FILTER, SERVER, PIPELINE, FILTER_APP,
+                      FILTER_WITH))
+
+# Attributes of composed contexts that hold other contexts
+_child_attributes = ('app_context', 'next_context', 'filter_context')
+_child_list_attributes = ('filter_contexts',)
+
+
+def _check_conf(conf, context):
+    for key, value in iteritems(conf):
+        if (not isinstance(key, basestring)
+            or not isinstance(value, basestring)):
+            raise ValueError(
+                "Cannot plan %r: configuration value %r = %r is not a "
+                "string" % (context, key, value))
+    return dict(conf)
+
+
+def describe_loader(loader):
+    """
+    Return a plain-data description of ``loader`` from which
+    :class:`PlannedLoader` can recreate it, or None.
+    """
+    if isinstance(loader, PlannedLoader):
+        return loader.description
+    if isinstance(loader, ConfigLoader):
+        return {'scheme': 'config', 'filename': loader.filename,
+                'defaults': dict(loader.parser._defaults)}
+    if isinstance(loader, EggLoader):
+        return {'scheme': 'egg', 'spec': loader.spec}
+    if isinstance(loader, FuncLoader):
+        return {'scheme': 'call', 'spec': loader.spec}
+    return None
+
+
+class PlannedLoader(_Loader):
+    """
+    Stands in for the loader of a planned context.  The real loader is
+    only created (and its config file parsed) if something, like a
+    composite, loads more objects through it.
+    """
+
+    def __init__(self, description):
+        self.description = description
+        self.filename = description.get('filename')
+        self.spec = description.get('spec')
+        self._loader = None
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.description)
+
+    @property
+    def loader(self):
+        if self._loader is None:
+            description = self.description
+            scheme = description['scheme']
+            if scheme == 'config':
+                loader = ConfigLoader(description['filename'])
+                loader.update_defaults(description['defaults'])
+            elif scheme == 'egg':
+                loader = EggLoader(description['spec'])
+            else:
+                loader = FuncLoader(description['spec'])
+            self._loader = loader
+        return self._loader
+
+    def get_context(self, object_type, name=None, global_conf=None):
+        return self.loader.get_context(
+            object_type, name=name, global_conf=global_conf)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.loader, attr)
+
+
+class ContextPlan(object):
+    """
+    The resolved, plain-data form of a context.  ``children`` maps the
+    attribute names of composed contexts (``app_context``,
+    ``filter_contexts``, ...) to plans (or lists of plans).
+    """
+
+    def __init__(self, object_type, protocol, object_spec,
+                 global_conf, local_conf, loader=None, section=None,
+                 entry_point_name=None, children=None):
+        self.object_type = object_type
+        self.protocol = protocol
+        self.object_spec = object_spec
+        self.global_conf = global_conf
+        self.local_conf = local_conf
+        self.loader = loader
+        self.section = section
+        self.entry_point_name = entry_point_name
+        if children is None:
+            children = {}
+        self.children = children
+
+    def __repr__(self):
+        return '<%s %s %s>' % (self.__class__.__name__, self.object_type,
+                               self.section or self.object_spec)
+
+    def __eq__(self, other):
+        return (isinstance(other, ContextPlan)
+                and self.to_dict() == other.to_dict())
+
+    def __ne__(self, other):
+        return not self == other
+
+    @classmethod
+    def from_context(cls, context):
+        """
+        Make a plan from a resolved context.  Raises ValueError if the
+        context can't be represented as plain data (e.g. its factory
+        wasn't imported by name, or its configuration has values
+        other than strings).
+        """
+        if not context.object_spec and context.object is not None:
+            raise ValueError(
+                "Cannot plan %r: the import path of its factory is not "
+                "known" % context)
+        loader = describe_loader(context.loader)
+        if loader is None and context.protocol in (
+            'paste.composite_factory', 'paste.composit_factory'):
+            raise ValueError(
+                "Cannot plan %r: composites need a loader, and %r cannot "
+                "be described" % (context, context.loader))
+        children = {}
+        for attr in _child_attributes:
+            child = getattr(context, attr, None)
+            if child is not None:
+                children[attr] = cls.from_context(child)
+        for attr in _child_list_attributes:
+            child_list = getattr(context, attr, None)
+            if child_list is not None:
+                children[attr] = [cls.from_context(child)
+                                  for child in child_list]
+        return cls(
+            object_type=context.object_type.name,
+            protocol=context.protocol,
+            object_spec=context.object_spec,
+            global_conf=_check_conf(context.global_conf, context),
+            local_conf=_check_conf(context.local_conf, context),
+            loader=loader,
+            section=context.section,
+            entry_point_name=context.entry_point_name,
+            children=children)
+
+    def to_dict(self):
+        """
+        Return the plan as a JSON-compatible dictionary.
+        """
+        children = {}
+        for attr, child in iteritems(self.children):
+            if isinstance(child, list):
+                children[attr] = [c.to_dict() for c in child]
+            else:
+                children[attr] = child.to_dict()
+        return {
+            'object_type': self.object_type,
+            'protocol': self.protocol,
+            'object_spec': self.object_spec,
+            'global_conf': self.global_conf,
+            'local_conf': self.local_conf,
+            'loader': self.loader,
+            'section': self.section,
+            'entry_point_name': self.entry_point_name,
+            'children': children,
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        children = {}
+        for attr, child in iteritems(data['children']):
+            if isinstance(child, list):
+                children[attr] = [cls.from_dict(c) for c in child]
+            else:
+                children[attr] = cls.from_dict(child)
+        return cls(
+            object_type=data['object_type'],
+            protocol=data['protocol'],
+            object_spec=data['object_spec'],
+            global_conf=data['global_conf'],
+            local_conf=data['local_conf'],
+            loader=data['loader'],
+            section=data['section'],
+            entry_point_name=data['entry_point_name'],
+            children=children)
+
+    def to_context(self):
+        """
+        Make a new :class:`~paste.deploy.loadwsgi.LoaderContext` from
+        the plan.  Like the contexts of the loaders, the factories it
+        refers to are only imported when their ``object`` is used.
+        """
+        if self.object_spec:
+            object_loader = _lazy_import(self.object_spec)
+        else:
+            object_loader = None
+        if self.loader is not None:
+            loader = PlannedLoader(self.loader)
+        else:
+            loader = None
+        context = LoaderContext(
+            None, _object_types[self.object_type], self.protocol,
+            dict(self.global_conf), dict(self.local_conf), loader,
+            entry_point_name=self.entry_point_name, section=self.section,
+            object_spec=self.object_spec, object_loader=object_loader)
+        for attr, child in iteritems(self.children):
+            if isinstance(child, list):
+                setattr(context, attr, [c.to_context() for c in child])
+            else:
+                setattr(context, attr, child.to_context())
+        return context
+
+    def create(self, shared=False, workers=None):
+        """
+        Create the object, with the ``shared`` and ``workers`` options
+        of :func:`~paste.deploy.loadwsgi.loadobj`.
+        """
+        return create_context(self.to_context(), shared=shared,
+                              workers=workers)
+
+
+def loadplan(object_type, uri, name=None, relative_to=None,
+             global_conf=None):
+    """
+    Resolve ``uri`` like :func:`~paste.deploy.loadwsgi.loadcontext`,
+    and return the result as a :class:`ContextPlan`.
+    """
+    context = loadcontext(object_type, uri, name=name,
+                          relative_to=relative_to, global_conf=global_conf)
+    return ContextPlan.from_context(context)
+
+
+def fingerprint(filename):
+    """
+    Return a digest of the contents of ``filename``, or None if it
+    can't be read.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def fingerprint_reads(reads):
+    """
+    Return ``[[filename, digest], ...]`` for the ``(filename,
+    stat_key)`` reads recorded while resolving, or None if a file
+    changed since it was read, in which case the digest might not be
+    of the contents that were parsed.
+    """
+    digests = {}
+    for filename, key in reads:
+        digest = fingerprint(filename)
+        try:
+            changed = _stat_key(filename) != key
+        except IOError:
+            changed = True
+        if changed or digests.get(filename, digest) != digest:
+            return None
+        digests[filename] = digest
+    return [[filename, digests[filename]] for filename in sorted(digests)]
+
+
+class ResolutionCache(object):
+    """
+    Plans for ``config:`` URIs stored as JSON files in ``directory``.
+
+    An entry records a fingerprint of every config file that was read
+    to resolve it (the main file and every ``use = config:...`` file),
+    and is only used while all of them are unchanged.  Entry points of
+    ``egg:`` references are stored by import path, so clear the
+    directory when upgrading installed distributions.
+    """
+
+    version = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.directory)
+
+    def entry_filename(self, object_type, filename, name, global_conf):
+        key = json.dumps([self.version, object_type.name,
+                          os.path.abspath(filename), name,
+                          sorted(iteritems(global_conf or {}))],
+                         default=repr)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, object_type, filename, name, global_conf=None):
+        """
+        Return the cached :class:`ContextPlan`, or None if there is no
+        valid entry.
+        """
+        entry_filename = self.entry_filename(
+            object_type, filename, name, global_conf)
+        try:
+            with open(entry_filename) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if entry.get('version') != self.version:
+            return None
+        for path, digest in entry['files']:
+            if fingerprint(path) != digest:
+                return None
+        return ContextPlan.from_dict(entry['plan'])
+
+    def set(self, object_type, filename, name, global_conf, plan, files):
+        """
+        Store ``plan``.  ``files`` are the ``[filename, digest]`` pairs
+        of the files it was resolved from (see
+        :func:`fingerprint_reads`).
+        """
+        entry = {
+            'version': self.version,
+            'files': files,
+            'plan': plan.to_dict(),
+            }
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        entry_filename = self.entry_filename(
+            object_type, filename, name, global_conf)
+        fd, tmp_filename = tempfile.mkstemp(
+            dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            # Replace atomically, so concurrent readers never see a
+            # partial entry
+            getattr(os, 'replace', os.rename)(tmp_filename, entry_filename)
+        except:
+            os.unlink(tmp_filename)
+            raise
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for entry_filename in os.listdir(self.directory):
+            if entry_filename.endswith('.json'):
+                os.unlink(os.path.join(self.directory, entry_filename))
+
+    def load_context(self, object_type, uri, name=None, relative_to=None,
+                     global_conf=None):
+        """
+        Like :func:`~paste.deploy.loadwsgi.loadcontext`, but use (and
+        fill) the cache for ``config:`` URIs.
+        """
+        base_uri, scheme, path, name = split_uri(uri, name)
+        if scheme != 'config':
+            return loadcontext(object_type, uri, name=name,
+                               relative_to=relative_to,
+                               global_conf=global_conf)
+        filename = config_path(base_uri, path, relative_to)
+        plan = self.get(object_type, filename, name, global_conf)
+        if plan is not None:
+            return plan.to_context()
+        with _FileRecording() as recording:
+            context = loadcontext(object_type, uri, name=name,
+                                  relative_to=relative_to,
+                                  global_conf=global_conf)
+        try:
+            plan = ContextPlan.from_context(context)
+        except ValueError:
+            return context
+        files = fingerprint_reads(recording.reads)
+        if files is None:
+            # A file was edited while loading; the next load stores
+            # the new plan
+            return context
+        try:
+            self.set(object_type, filename, name, global_conf, plan, files)
+        except (IOError, OSError):
+            # The cache only speeds loading up; an unwritable cache
+            # (read-only, or not a directory) mustn't make it fail
+            pass
+        return context
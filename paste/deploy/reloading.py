@@ -0,0 +1,192 @@
+# (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
+# Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
+"""Apps that pick up configuration changes without a restart
+
+:func:`reloadapp` loads an app like :func:`~paste.deploy.loadapp`, and
+returns a WSGI app that checks the config files involved (the main
+file and every file pulled in with ``use = config:...``) at most every
+``interval`` seconds.  When one of them changed, the configuration is
+loaded again; only the sections whose effective configuration changed
+are created again, and the rest of the objects are reused.  The new
+app then replaces the old one for new requests, while requests already
+in progress finish on the old one::
+
+    app = reloadapp('config:production.ini', relative_to='.')
+
+If reloading fails, the old app keeps serving and the error is
+written to ``wsgi.errors`` (and kept in ``ReloadingApp.error``).
+Factories are looked up again, but modules are not re-imported.
+
+Files are watched by comparing their ``stat()`` results; pass
+``watcher`` to use something else (e.g. inotify).
+"""
+from __future__ import with_statement
+import os
+import sys
+import threading
+import time
+import traceback
+
+from paste.deploy.loadwsgi import (
+    APP, InstanceRegistry, _FileRecording, loadcontext)
+
+__all__ = ['reloadapp', 'ReloadingApp', 'FileWatcher']
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def _stat(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino)
+
+
+class FileWatcher(object):
+    """
+    Tells whether any of ``files`` changed (or appeared or vanished)
+    since the watcher was made.
+    """
+
+    def __init__(self, files):
+        self.files = sorted(set(files))
+        self._stats = [_stat(filename) for filename in self.files]
+
+    def changed(self):
+        for filename, stat in zip(self.files, self._stats):
+            if _stat(filename) != stat:
+                return True
+        return False
+
+
+class _GenerationRegistry(InstanceRegistry):
+    """
+    Shares objects within one load, and reuses the objects of the
+    previous load whose section is unchanged.  Composites are always
+    created again, because the sections they load may have changed.
+    """
+
+    def __init__(self, previous=None):
+        InstanceRegistry.__init__(self)
+        if previous is not None:
+            self.previous = previous._instances
+        else:
+            self.previous = {}
+
+    def key(self, context):
+        if context.protocol in ('paste.composite_factory',
+                                'paste.composit_factory'):
+            return None
+        return InstanceRegistry.key(self, context)
+
+    def get_or_create(self, context):
+        key = self.key(context)
+        if key is not None and key in self.previous:
+            with self._lock:
+                return self._instances.setdefault(key, self.previous[key])
+        return InstanceRegistry.get_or_create(self, context)
+
+
+class ReloadingApp(object):
+    """
+    A WSGI app that delegates to the app loaded from ``uri``, and
+    loads it again when its config files change.  ``interval`` is the
+    minimum number of seconds between checks, or None to only reload
+    when :meth:`reload` or :meth:`check` is called.
+    """
+
+    def __init__(self, uri, name=None, relative_to=None, global_conf=None,
+                 interval=1.0, watcher=FileWatcher):
+        self.uri = uri
+        self.name = name
+        self.relative_to = relative_to
+        self.global_conf = global_conf
+        self.interval = interval
+        self.watcher_factory = watcher
+        self.generation = 0
+        self.error = None
+        self.registry = None
+        self.watcher = None
+        self.app = None
+        self._lock = threading.Lock()
+        self._next_check = 0
+        self.reload()
+
+    def __repr__(self):
+        return '<%s %s generation %s>' % (
+            self.__class__.__name__, self.uri, self.generation)
+
+    def _load(self):
+        registry = _GenerationRegistry(self.registry)
+        context = loadcontext(
+            APP, self.uri, name=self.name,
+            relative_to=self.relative_to, global_conf=self.global_conf)
+        return registry.create(context), registry
+
+    def reload(self):
+        """
+        Load the app again, reusing the objects of unchanged sections,
+        and swap it in.  Raises any error from loading, in which case
+        the old app stays.
+        """
+        with self._lock:
+            # Composites load their apps while being created, so the
+            # files are recorded for the creation too
+            recording = _FileRecording()
+            try:
+                with recording:
+                    app, registry = self._load()
+            except Exception:
+                self.error = sys.exc_info()[1]
+                if self.watcher is not None:
+                    # Don't try again until the files change again.
+                    # The files read before the error (which may
+                    # include a newly used one that caused it) are
+                    # watched too.
+                    self.watcher = self.watcher_factory(
+                        self.watcher.files + recording.files)
+                raise
+            self.registry = registry
+            self.watcher = self.watcher_factory(recording.files)
+            self.error = None
+            self.generation += 1
+            self.app = app
+
+    def check(self):
+        """
+        Reload if any of the config files changed.  Returns true if
+        the app was reloaded.
+        """
+        if not self.watcher.changed():
+            return False
+        self.reload()
+        return True
+
+    def __call__(self, environ, start_response):
+        if self.interval is not None:
+            now = _clock()
+            if now >= self._next_check:
+                self._next_check = now + self.interval
+                try:
+                    self.check()
+                except Exception:
+                    errors = environ.get('wsgi.errors', sys.stderr)
+                    errors.write('Reloading %s failed; still serving '
+                                 'the previous app:\n%s'
+                                 % (self.uri, traceback.format_exc()))
+        # Take the app once, so a concurrent reload can't change it
+        # in the middle of the request
+        app = self.app
+        return app(environ, start_response)
+
+
+def reloadapp(uri, name=None, relative_to=None, global_conf=None,
+              interval=1.0, watcher=FileWatcher):
+    """
+    Load an app like :func:`~paste.deploy.loadapp`, and return a
+    :class:`ReloadingApp` that reloads it when its config files change.
+    """
+    return ReloadingApp(uri, name=name, relative_to=relative_to,
+                        global_conf=global_conf, interval=interval,
+                        watcher=watcher)
@@ -0,0 +1,288 @@
+# (c) 2005 Ian Bicking and contributors; written for Paste (http://pythonpaste.org)
+# Licensed under the MIT license: http://www.opensource.org/licenses/mit-license.php
+"""Timing of the phases of loading a configuration
+
+While a trace is active, :mod:`paste.deploy.loadwsgi` records a span
+for each phase of a load:
+
+``parse``
+    reading and parsing a config file
+``resolve``
+    finding a section and building its context (including the
+    sections it ``use``\\s, which are nested spans)
+``import``
+    importing a factory
+``create``
+    calling a factory
+
+Use it like::
+
+    with timing.trace() as trace:
+        app = loadapp('config:production.ini')
+    print(trace.format())
+    trace.write_chrome_trace('load.json')
+
+The JSON file can be opened in ``chrome://tracing`` or Perfetto.  If
+the environment variable ``PASTE_DEPLOY_TRACE`` is set to a filename,
+every ``loadapp``/``loadfilter``/``loadserver`` call writes such a
+file.
+"""
+from __future__ import with_statement
+import json
+import os
+import threading
+import time
+
+from paste.deploy.compat import ContextVar
+
+__all__ = ['LoadTrace', 'Span', 'trace', 'span', 'active', 'call_in',
+           'ENVIRON_KEY']
+
+ENVIRON_KEY = 'PASTE_DEPLOY_TRACE'
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class _ThreadActive(threading.local):
+    # Stands in for a ContextVar before Python 3.7
+    value = None
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+# The trace that spans are currently recorded in, per thread (and per
+# asyncio task where ContextVar exists), so concurrent loads don't
+# see each other's traces
+if ContextVar is not None:
+    _active = ContextVar('paste.deploy.timing.active', default=None)
+else:
+    _active = _ThreadActive()
+
+
+class Span(object):
+
+    __slots__ = ('phase', 'name', 'args', 'start', 'end', 'thread',
+                 'children')
+
+    def __init__(self, phase, name, args):
+        self.phase = phase
+        self.name = name
+        self.args = args
+        self.start = _clock()
+        self.end = None
+        self.thread = threading.current_thread().ident
+        self.children = []
+
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def __repr__(self):
+        return '<Span %s %s %s>' % (self.phase, self.name, self.duration)
+
+    def walk(self, depth=0):
+        """
+        Yield ``(depth, span)`` for this span and all its descendants.
+        """
+        yield depth, self
+        for child in self.children:
+            for item in child.walk(depth + 1):
+                yield item
+
+
+class _SpanContext(object):
+
+    __slots__ = ('trace', 'span')
+
+    def __init__(self, trace, span):
+        self.trace = trace
+        self.span = span
+
+    def __enter__(self):
+        self.trace._push(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.span.end = _clock()
+        if exc_type is not None:
+            self.span.args['error'] = repr(exc_value)
+        self.trace._pop(self.span)
+
+
+class _NullContext(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, tb):
+        pass
+
+_null_context = _NullContext()
+
+
+class LoadTrace(object):
+    """
+    A tree of :class:`Span` objects recorded while loading.  Spans
+    recorded in other threads (e.g. with ``loadapp(..., workers=N)``)
+    start new roots.
+    """
+
+    def __init__(self):
+        self.roots = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = _clock()
+
+    def span(self, phase, name, **args):
+        return _SpanContext(self, Span(phase, name, args))
+
+    def _push(self, span):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        if stack:
+            stack[-1].children.append(span)
+        else:
+            with self._lock:
+                self.roots.append(span)
+        stack.append(span)
+
+    def _pop(self, span):
+        popped = self._local.stack.pop()
+        assert popped is span
+
+    def spans(self):
+        """
+        Yield ``(depth, span)`` for every span, depth first.
+        """
+        for root in self.roots:
+            for item in root.walk():
+                yield item
+
+    def totals(self):
+        """
+        Return a dictionary of the time spent in each phase, not
+        counting time spent in nested spans of the same phase.
+        """
+        totals = {}
+        for depth, span in self.spans():
+            if span.duration is None:
+                continue
+            own = span.duration - sum(
+                child.duration for child in span.children
+                if child.phase == span.phase and child.duration is not None)
+            totals[span.phase] = totals.get(span.phase, 0) + own
+        return totals
+
+    def format(self):
+        """
+        Return the tree as indented text, one span per line.
+        """
+        lines = []
+        for depth, span in self.spans():
+            duration = span.duration
+            if duration is None:
+                duration = float('nan')
+            lines.append('%s%-8s %8.3fms  %s' % (
+                '  ' * depth, span.phase, duration * 1000, span.name))
+        return '\n'.join(lines)
+
+    def to_chrome_trace(self):
+        """
+        Return the spans as a Chrome trace-event format dictionary.
+        """
+        pid = os.getpid()
+        events = []
+        for depth, span in self.spans():
+            if span.end is None:
+                continue
+            args = dict((key, str(value))
+                        for key, value in span.args.items())
+            events.append({
+                'name': span.name,
+                'cat': span.phase,
+                'ph': 'X',
+                'ts': (span.start - self._origin) * 1e6,
+                'dur': (span.end - span.start) * 1e6,
+                'pid': pid,
+                'tid': span.thread,
+                'args': args,
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+class trace(object):
+    """
+    Record a :class:`LoadTrace` while in the ``with`` block (which
+    gives the trace).  Traces can be nested; the inner one records the
+    spans while it is active.  A trace is only active in the thread
+    (or asyncio task) that entered it; see :func:`call_in`.
+    """
+
+    def __init__(self, load_trace=None):
+        if load_trace is None:
+            load_trace = LoadTrace()
+        self.load_trace = load_trace
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = _active.get()
+        _active.set(self.load_trace)
+        return self.load_trace
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _active.set(self._previous)
+
+
+def active():
+    """
+    Return the :class:`LoadTrace` spans are recorded in, or None.
+    """
+    return _active.get()
+
+
+def call_in(load_trace, func, *args, **kw):
+    """
+    Call ``func`` with ``load_trace`` active (if it isn't None); used
+    to record the spans of work done on other threads.
+    """
+    if load_trace is None:
+        return func(*args, **kw)
+    with trace(load_trace):
+        return func(*args, **kw)
+
+
+def span(phase, name, **args):
+    """
+    Return a context manager that records a span in the active trace,
+    or does nothing if there is none.  ``name`` may be a function
+    returning the name, so it is only made when a span is recorded.
+    """
+    load_trace = _active.get()
+    if load_trace is None:
+        return _null_context
+    if callable(name):
+        name = name()
+    return load_trace.span(phase, name, **args)
+
+
+def environ_trace():
+    """
+    Return a :class:`trace` if ``PASTE_DEPLOY_TRACE`` is set and no
+    trace is active yet, otherwise None.
+    """
+    if _active.get() is None and os.environ.get(ENVIRON_KEY):
+        return trace()
+    return None
@@ -3,7 +3,7 @@
 import inspect
 import sys
 
-from paste.deploy.compat import reraise
+from paste.deploy.compat import MutableMapping, reraise
 
 
 def fix_type_error(exc_info, callable, varargs, kwargs):
@@ -68,7 +68,104 @@ def lookup_object(spec):
     parts, target = spec.split(':') if ':' in spec else (spec, None)
     module = __import__(parts)
 
-    for part in parts.split('.')[1:] + ([target] if target else []):
+    for part in parts.split('.')[1:] + (target.split('.') if target else []):
         module = getattr(module, part)
 
     return module
+
+
+_deleted = object()
+
+
+class CopyOnWriteDict(MutableMapping):
+    """
+    A dictionary that reads through to ``base`` and keeps its own
+    changes in a separate layer, so making one doesn't copy ``base``
+    and only changing it allocates anything.  Reads are slower than a
+    ``dict``'s, since they go through Python code.  ``base`` is never modified, and
+    must not be changed while overlays of it are in use.
+    """
+
+    __slots__ = ('base', '_changes')
+
+    def __init__(self, base, changes=None):
+        self.base = base
+        self._changes = changes
+
+    def __getitem__(self, key):
+        changes = self._changes
+        if changes and key in changes:
+            value = changes[key]
+            if value is _deleted:
+                raise KeyError(key)
+            return value
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        if self._changes is None:
+            self._changes = {}
+        self._changes[key] = value
+
+    def update(self, *args, **kw):
+        if self._changes is None:
+            self._changes = {}
+        self._changes.update(*args, **kw)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if self._changes is None:
+            self._changes = {}
+        self._changes[key] = _deleted
+
+    def __contains__(self, key):
+        changes = self._changes
+        if changes and key in changes:
+            return changes[key] is not _deleted
+        return key in self.base
+
+    def __iter__(self):
+        changes = self._changes
+        if not changes:
+            for key in self.base:
+                yield key
+            return
+        for key in self.base:
+            if key not in changes:
+                yield key
+        for key, value in changes.items():
+            if value is not _deleted:
+                yield key
+
+    def __len__(self):
+        if not self._changes:
+            return len(self.base)
+        return sum(1 for key in self)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self))
+
+    def todict(self):
+        """
+        Return the contents as a plain dictionary.
+        """
+        result = dict(self.base)
+        if self._changes:
+            for key, value in self._changes.items():
+                if value is _deleted:
+                    result.pop(key, None)
+                else:
+                    result[key] = value
+        return result
+
+    def copy(self):
+        if self._changes:
+            return self.__class__(self.base, dict(self._changes))
+        return self.__class__(self.base)
+
+    @property
+    def changed(self):
+        """
+        True if anything was set or deleted.
+        """
+        return bool(self._changes)
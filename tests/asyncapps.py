@@ -0,0 +1,39 @@
+"""Asynchronous factories for test_asyncload"""
+import asyncio
+
+# Factories that must run at the same time wait on this
+started = []
+
+
+async def wait_for_peer(name):
+    started.append(name)
+    for i in range(100):
+        if len(started) > 1:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('%s ran alone' % name)
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-type', 'text/plain')])
+    return ['async']
+
+
+async def make_app(global_conf, **local_conf):
+    await wait_for_peer('app')
+    app.local_conf = local_conf
+    return app
+
+
+async def make_filter(global_conf, **local_conf):
+    await wait_for_peer('filter')
+
+    def async_filter(app):
+        async_filter.app = app
+        return async_filter
+    return async_filter
+
+
+async def make_call_app(global_conf, **local_conf):
+    await asyncio.sleep(0)
+    return app
@@ -0,0 +1,24 @@
+"""Coroutines for test_dispatching_config (Python 3.7+ only)"""
+import asyncio
+
+
+async def request(config, name):
+    conf = {'name': name}
+    config.push_thread_config(conf)
+    try:
+        # Let the other requests push their configuration
+        await asyncio.sleep(0.01)
+        return config['name']
+    finally:
+        config.pop_thread_config(conf)
+
+
+def run_requests(config, count):
+    """
+    Run ``count`` concurrent requests as tasks, and return the
+    ``name`` each of them saw.
+    """
+    async def main():
+        return await asyncio.gather(*[
+            request(config, 'request%s' % i) for i in range(count)])
+    return asyncio.run(main())
@@ -0,0 +1,31 @@
+"""Factories that count their calls, for test_reloading"""
+
+created = []
+
+
+class App(object):
+
+    def __init__(self, conf):
+        self.conf = conf
+
+    def __call__(self, environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/plain')])
+        return [self.conf['message'].encode('ascii')]
+
+
+def make_app(global_conf, **local_conf):
+    created.append(('app', local_conf.get('message')))
+    return App(local_conf)
+
+
+def make_filter(global_conf, **local_conf):
+    created.append(('filter', local_conf.get('header')))
+
+    def filter(app):
+        def filtered(environ, start_response):
+            def replace_start_response(status, headers, exc_info=None):
+                headers.append(('X-Filter', local_conf['header']))
+                return start_response(status, headers, exc_info)
+            return app(environ, replace_start_response)
+        return filtered
+    return filter
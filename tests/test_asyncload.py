@@ -0,0 +1,50 @@
+import sys
+
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+
+from paste.deploy import loadapp
+from tests.fixture import *
+import fakeapp.apps
+
+if sys.version_info >= (3, 7):
+    import asyncio
+    from paste.deploy.asyncload import aloadapp
+    from tests import asyncapps
+
+
+here = os.path.dirname(__file__)
+config_uri = 'config:sample_configs/test_async.ini'
+
+
+def setup_module():
+    if sys.version_info < (3, 7):
+        raise SkipTest
+
+
+def run(coro):
+    del asyncapps.started[:]
+    return asyncio.run(coro)
+
+
+def test_async_pipeline():
+    app = run(aloadapp(config_uri, relative_to=here))
+    assert app.app is asyncapps.app
+    eq_(app.app.local_conf, {'setting': 'value'})
+    eq_(sorted(asyncapps.started), ['app', 'filter'])
+
+
+def test_call_coroutine_function():
+    app = run(aloadapp(config_uri + '#call', relative_to=here))
+    assert app is asyncapps.app
+
+
+def test_mixed_with_sync_factories():
+    app = run(aloadapp(config_uri + '#mixed', relative_to=here))
+    assert isinstance(app, fakeapp.apps.CapFilter)
+    assert app.app is asyncapps.app
+
+
+def test_sync_loader_refuses_async_protocols():
+    assert_raises(TypeError, loadapp, config_uri + '#async_app',
+                  relative_to=here)
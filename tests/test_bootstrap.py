@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+
+from nose.tools import eq_
+
+from paste.deploy import loadapp
+from paste.deploy.bootstrap import compile_bootstrap, main
+from tests.fixture import *
+import fakeapp.apps
+import fakeapp.configapps as fc
+
+
+here = os.path.dirname(__file__)
+config_path = os.path.join(here, 'sample_configs')
+
+
+def compile_and_create(uri):
+    source = compile_bootstrap(uri, relative_to=config_path)
+    namespace = {'__name__': 'generated_bootstrap'}
+    exec(compile(source, 'generated_bootstrap.py', 'exec'), namespace)
+    assert namespace['is_current']()
+    return source, namespace['create']()
+
+
+def test_app():
+    source, app = compile_and_create('config:test_config.ini#test3')
+    assert 'ConfigParser' not in source
+    assert 'from paste' not in source
+    assert isinstance(app, fc.SimpleApp)
+    expected = loadapp('config:test_config.ini#test3',
+                       relative_to=config_path)
+    eq_(app.global_conf, expected.global_conf)
+    eq_(app.local_conf, expected.local_conf)
+
+
+def test_pipeline():
+    source, app = compile_and_create('config:test_filter.ini#piped')
+    assert isinstance(app, fakeapp.apps.CapFilter)
+    assert app.app is fakeapp.apps.basic_app
+    eq_(app.method_to_call, 'upper')
+
+
+def test_filter_app_factory():
+    source, app = compile_and_create('config:test_filter.ini#filt2')
+    assert isinstance(app, fakeapp.apps.CapFilter)
+    assert app.app is fakeapp.apps.basic_app
+    eq_(app.method_to_call, 'lower')
+
+
+def test_filter_with_filter_with():
+    source, app = compile_and_create('config:test_filter_with.ini')
+    assert isinstance(app, fakeapp.apps.CapFilter)
+    assert isinstance(app.app, fakeapp.apps.CapFilter)
+    assert app.app.app is fakeapp.apps.basic_app
+
+
+def test_composite():
+    source, app = compile_and_create('config:basic_app.ini#remote_addr')
+    assert 'PlannedLoader' in source
+    assert isinstance(app, fakeapp.apps.RemoteAddrDispatch)
+    assert app.map['127.0.0.1'] is fakeapp.apps.basic_app
+    assert app.map['0.0.0.0'] is fakeapp.apps.basic_app2
+
+
+def test_main():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        config = os.path.join(tmp_dir, 'app.ini')
+        shutil.copy(os.path.join(config_path, 'test_func.ini'), config)
+        output = os.path.join(tmp_dir, 'app_bootstrap.py')
+        main([config + '#other', '-o', output])
+        namespace = {}
+        with open(output) as f:
+            exec(compile(f.read(), output, 'exec'), namespace)
+        assert namespace['create']() is fakeapp.apps.basic_app2
+        with open(config, 'a') as f:
+            f.write('\n# changed\n')
+        assert not namespace['is_current']()
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+
+from nose.tools import eq_, assert_raises
+
+from paste.deploy.loadwsgi import ConfigCache, ConfigLoader, appconfig
+from tests.fixture import *
+
+
+def setup_module():
+    global tmp_dir
+    tmp_dir = tempfile.mkdtemp()
+
+
+def teardown_module():
+    shutil.rmtree(tmp_dir)
+
+
+def write_config(name, body):
+    filename = os.path.join(tmp_dir, name)
+    with open(filename, 'w') as f:
+        f.write(body)
+    return filename
+
+
+def test_reuses_parsed_state():
+    cache = ConfigCache()
+    filename = write_config('reuse.ini', '[app:main]\nfoo = bar\n')
+    ConfigLoader(filename, cache=cache)
+    eq_(len(cache), 1)
+    # Tamper with the cached state to prove the second loader uses it
+    key = cache.stat_key(filename)
+    state = cache.get(filename, key)
+    state[1][0][1]['foo'] = 'cached'
+    loader = ConfigLoader(filename, cache=cache)
+    eq_(loader.parser.get('app:main', 'foo'), 'cached')
+
+
+def test_loaders_do_not_share_mutations():
+    cache = ConfigCache()
+    filename = write_config('mutate.ini', '[app:main]\nfoo = bar\n')
+    loader1 = ConfigLoader(filename, cache=cache)
+    loader1.update_defaults({'extra': 'value'})
+    loader1.parser.set('app:main', 'foo', 'changed')
+    loader2 = ConfigLoader(filename, cache=cache)
+    assert 'extra' not in loader2.parser.defaults()
+    eq_(loader2.parser.get('app:main', 'foo'), 'bar')
+
+
+def test_changed_file_is_reparsed():
+    cache = ConfigCache()
+    filename = write_config('changed.ini', '[app:main]\nfoo = bar\n')
+    ConfigLoader(filename, cache=cache)
+    write_config('changed.ini', '[app:main]\nfoo = something else\n')
+    loader = ConfigLoader(filename, cache=cache)
+    eq_(loader.parser.get('app:main', 'foo'), 'something else')
+
+
+def test_invalidate_and_maxsize():
+    cache = ConfigCache(maxsize=2)
+    filenames = [write_config('size%s.ini' % i, '[app:main]\n')
+                 for i in range(3)]
+    for filename in filenames:
+        ConfigLoader(filename, cache=cache)
+    eq_(len(cache), 2)
+    key = cache.stat_key(filenames[0])
+    assert cache.get(filenames[0], key) is None
+    cache.invalidate(filenames[1])
+    eq_(len(cache), 1)
+    cache.invalidate()
+    eq_(len(cache), 0)
+
+
+def test_no_cache():
+    filename = write_config('nocache.ini', '[app:main]\nfoo = bar\n')
+    loader = ConfigLoader(filename, cache=False)
+    eq_(loader.parser.get('app:main', 'foo'), 'bar')
+
+
+def test_appconfig_uses_cache():
+    filename = write_config(
+        'appconfig.ini',
+        '[DEFAULT]\ndef1 = a\n\n'
+        '[app:main]\nuse = egg:FakeApp#configed\nfoo = %(def1)s\n')
+    first = appconfig('config:' + filename)
+    second = appconfig('config:' + filename)
+    eq_(first, second)
+    eq_(second['foo'], 'a')
+
+
+def test_missing_file_raises_ioerror():
+    filename = os.path.join(tmp_dir, 'missing.ini')
+    for cache in (ConfigCache(), False):
+        assert_raises(IOError, ConfigLoader, filename, cache=cache)
+    assert_raises(IOError, ConfigLoader, filename, lazy=True)
@@ -1,7 +1,10 @@
-from nose.tools import assert_raises
+from io import BytesIO
+
+from nose.tools import assert_raises, eq_
 from nose.plugins.skip import SkipTest
 
-from paste.deploy.config import ConfigMiddleware
+from paste.deploy.config import CONFIG, ConfigMiddleware, make_config_filter
+from paste.deploy.util import CopyOnWriteDict
 
 
 class Bug(Exception):
@@ -26,3 +29,128 @@ def test_error():
     wrapped = ConfigMiddleware(app_with_exception, {'test': 1})
     test_app = TestApp(wrapped)
     assert_raises(Bug, test_app.get, '/')
+
+
+def test_request_config_copies():
+    config = {'test': 1}
+    middleware = ConfigMiddleware(app_with_exception, config)
+    conf = middleware.request_config()
+    conf['test'] = 2
+    assert config == {'test': 1}
+    config['new'] = 3
+    assert middleware.request_config() == {'test': 1, 'new': 3}
+
+
+def test_request_config_copy_on_write():
+    config = {'test': 1, 'other': 'x'}
+    middleware = ConfigMiddleware(app_with_exception, config,
+                                  copy_on_write=True)
+    conf = middleware.request_config()
+    assert isinstance(conf, CopyOnWriteDict)
+    assert conf.base is middleware.request_config().base
+    assert not conf.changed
+    eq_(conf['test'], 1)
+    conf['test'] = 2
+    del conf['other']
+    assert conf.changed
+    eq_(dict(conf), {'test': 2})
+    eq_(dict(middleware.request_config()), config)
+    eq_(config, {'test': 1, 'other': 'x'})
+
+
+def test_make_config_filter():
+    middleware = make_config_filter(app_with_exception, {'global': 'g'},
+                                    setting='s')
+    eq_(middleware.request_config(), {'global': 'g', 'setting': 's'})
+    assert not isinstance(middleware.request_config(), CopyOnWriteDict)
+    middleware = make_config_filter(app_with_exception, {'global': 'g'},
+                                    setting='s', copy_on_write='true')
+    conf = middleware.request_config()
+    assert isinstance(conf, CopyOnWriteDict)
+    eq_(dict(conf), {'global': 'g', 'setting': 's'})
+
+
+def test_copy_on_write_dict():
+    base = {'a': 1, 'b': 2}
+    conf = CopyOnWriteDict(base)
+    eq_(len(conf), 2)
+    eq_(sorted(conf), ['a', 'b'])
+    assert 'a' in conf and 'c' not in conf
+    eq_(conf.get('c', 'default'), 'default')
+    conf['c'] = 3
+    del conf['a']
+    assert_raises(KeyError, conf.__getitem__, 'a')
+    assert_raises(KeyError, conf.__delitem__, 'a')
+    assert 'a' not in conf
+    eq_(len(conf), 2)
+    eq_(sorted(conf.items()), [('b', 2), ('c', 3)])
+    copied = conf.copy()
+    copied['a'] = 'again'
+    eq_(sorted(copied), ['a', 'b', 'c'])
+    eq_(sorted(conf), ['b', 'c'])
+    conf.update(b=20)
+    eq_(conf['b'], 20)
+    eq_(conf.todict(), {'b': 20, 'c': 3})
+    eq_(type(conf.todict()), dict)
+    eq_(base, {'a': 1, 'b': 2})
+
+
+class StreamingApp(object):
+
+    def __init__(self):
+        self.closed = False
+        self.seen = []
+
+    def __call__(self, environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/plain')])
+        return self.iterate(environ)
+
+    def iterate(self, environ):
+        try:
+            for i in range(2):
+                self.seen.append(CONFIG['test'])
+                yield b'chunk'
+        finally:
+            self.closed = True
+
+
+def test_streaming_response():
+    app = StreamingApp()
+    wrapped = ConfigMiddleware(app, {'test': 'value'})
+    app_iter = wrapped({}, lambda status, headers: None)
+    eq_(list(app_iter), [b'chunk', b'chunk'])
+    eq_(app.seen, ['value', 'value'])
+    assert CONFIG.current_conf() is not None
+    app_iter.close()
+    assert app.closed
+    assert CONFIG.current_conf() is None
+    # Closing twice doesn't pop another configuration
+    app_iter.close()
+
+
+def test_streaming_response_closed_early():
+    app = StreamingApp()
+    wrapped = ConfigMiddleware(app, {'test': 'value'})
+    app_iter = wrapped({}, lambda status, headers: None)
+    eq_(next(app_iter), b'chunk')
+    app_iter.close()
+    assert app.closed
+    eq_(app.seen, ['value'])
+    assert CONFIG.current_conf() is None
+
+
+def test_file_wrapper_kept():
+    from wsgiref.util import FileWrapper
+    filelike = BytesIO(b'content')
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/plain')])
+        return environ['wsgi.file_wrapper'](filelike)
+    wrapped = ConfigMiddleware(app, {'test': 'value'})
+    app_iter = wrapped({'wsgi.file_wrapper': FileWrapper},
+                       lambda status, headers: None)
+    assert isinstance(app_iter, FileWrapper)
+    eq_(CONFIG['test'], 'value')
+    app_iter.close()
+    assert filelike.closed
+    assert CONFIG.current_conf() is None
@@ -0,0 +1,69 @@
+import sys
+import threading
+
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+
+from paste.deploy.config import DispatchingConfig
+
+
+def test_push_pop():
+    config = DispatchingConfig()
+    assert config.current_conf() is None
+    config.push_process_config({'a': 'process'})
+    config.push_thread_config({'a': 'outer'})
+    inner = {'a': 'inner'}
+    config.push_thread_config(inner)
+    eq_(config['a'], 'inner')
+    assert_raises(AssertionError, config.pop_thread_config, {})
+    eq_(config['a'], 'outer')
+    config.pop_thread_config()
+    eq_(config['a'], 'process')
+    eq_(config.keys(), {'a': 'process'}.keys())
+    config.pop_process_config()
+    assert config.current_conf() is None
+    assert_raises(AttributeError, getattr, config, 'keys')
+
+
+def test_instances_are_independent():
+    config1 = DispatchingConfig()
+    config2 = DispatchingConfig()
+    config1.push_thread_config({'a': 1})
+    try:
+        assert config2.current_conf() is None
+    finally:
+        config1.pop_thread_config()
+
+
+def test_threads():
+    config = DispatchingConfig()
+    config.push_thread_config({'name': 'main'})
+    seen = {}
+    ready = threading.Event()
+    done = threading.Event()
+
+    def worker():
+        seen['before'] = config.current_conf()
+        config.push_thread_config({'name': 'worker'})
+        ready.set()
+        done.wait(5)
+        seen['after'] = config['name']
+        config.pop_thread_config()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    ready.wait(5)
+    eq_(config['name'], 'main')
+    done.set()
+    thread.join()
+    config.pop_thread_config()
+    assert seen['before'] is None
+    eq_(seen['after'], 'worker')
+
+
+def test_asyncio_tasks():
+    if sys.version_info < (3, 7):
+        raise SkipTest
+    from tests.asyncrequests import run_requests
+    config = DispatchingConfig()
+    eq_(run_requests(config, 5), ['request%s' % i for i in range(5)])
+    assert config.current_conf() is None
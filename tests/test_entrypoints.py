@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+
+from paste.deploy import entrypoints, loadapp
+from paste.deploy.loadwsgi import APP, EggLoader, import_string, loadcontext
+from tests.fixture import *
+import fakeapp.apps
+import fakeapp.configapps
+
+
+def requires_metadata():
+    # Without importlib.metadata (or its backport) distributions are
+    # found with pkg_resources
+    if entrypoints.metadata is None:
+        raise SkipTest
+
+
+def test_loadwsgi_does_not_import_pkg_resources():
+    requires_metadata()
+    code = ('import sys; import paste.deploy.loadwsgi; '
+            'sys.exit("pkg_resources" in sys.modules)')
+    base = os.path.dirname(os.path.dirname(__file__))
+    eq_(subprocess.call([sys.executable, '-c', code], cwd=base), 0)
+
+
+def test_get_distribution():
+    requires_metadata()
+    dist = entrypoints.get_distribution('FakeApp')
+    assert not hasattr(dist, 'get_entry_map')
+    location = entrypoints.distribution_location(dist)
+    assert location.endswith('FakeApp.egg'), location
+
+
+def test_versioned_spec_uses_pkg_resources():
+    dist = entrypoints.get_distribution('FakeApp==1.0')
+    eq_(dist.project_name, 'FakeApp')
+    entry = entrypoints.get_entry_info(
+        'FakeApp==1.0', 'paste.app_factory', 'basic_app')
+    assert entry.load() is fakeapp.apps.make_basic_app
+
+
+def test_get_entry_info():
+    entry = entrypoints.get_entry_info(
+        'FakeApp', 'paste.filter_factory', 'caps')
+    eq_(entry.name, 'caps')
+    assert entry.load() is fakeapp.apps.make_cap_filter
+    assert entrypoints.get_entry_info(
+        'FakeApp', 'paste.filter_factory', 'missing') is None
+    eq_(sorted(entrypoints.get_entry_map('FakeApp', 'paste.app_factory')),
+        ['basic_app', 'configed', 'other'])
+
+
+def test_import_string():
+    eq_(import_string('fakeapp.configapps:SimpleApp.make_app'),
+        fakeapp.configapps.SimpleApp.make_app)
+    assert_raises(ImportError, import_string, 'fakeapp.apps:missing')
+
+
+def test_import_string_normalizes_spec():
+    make_app = fakeapp.configapps.SimpleApp.make_app
+    eq_(import_string('fakeapp.configapps : SimpleApp.make_app'), make_app)
+    eq_(import_string('fakeapp.configapps:SimpleApp.make_app [extra]'),
+        make_app)
+    eq_(import_string(' fakeapp.configapps:SimpleApp.make_app [a, b] '),
+        make_app)
+
+
+def test_config_specs_are_normalized():
+    here = os.path.dirname(__file__)
+    uri = 'config:sample_configs/test_entry_point_specs.ini'
+    for name in ('spaced', 'extras'):
+        context = loadcontext(APP, uri, name=name, relative_to=here)
+        eq_(context.object_spec, 'fakeapp.configapps:SimpleApp.make_app')
+        app = loadapp(uri, name=name, relative_to=here)
+        assert isinstance(app, fakeapp.configapps.SimpleApp)
+
+
+def test_missing_entry_point():
+    try:
+        loadapp('egg:FakeApp#missing')
+    except LookupError:
+        e = sys.exc_info()[1]
+        assert 'basic_app' in str(e), str(e)
+    else:
+        assert False, 'Should have raised LookupError'
+
+
+def test_index_is_shared():
+    loader1 = EggLoader('FakeApp')
+    loader2 = EggLoader('FakeApp')
+    assert loader1.index is loader2.index
+    assert loader1.index is entrypoints.get_index('FakeApp')
+    eq_(loader1.index.names('paste.filter_app_factory'), ['caps2'])
+    assert loader1.index.get('paste.filter_app_factory', 'caps') is None
+    assert loader1.index.get('no.such.group', 'caps') is None
+
+
+def test_clear_index_cache():
+    index = entrypoints.get_index('FakeApp')
+    entrypoints.clear_index_cache()
+    assert entrypoints.get_index('FakeApp') is not index
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import threading
+from wsgiref.simple_server import (
+    make_server, ServerHandler, WSGIRequestHandler)
+
+from nose.tools import eq_
+from nose.plugins.skip import SkipTest
+
+from paste.deploy.config import CONFIG, ConfigMiddleware, PrefixMiddleware
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    # Python 2
+    from urllib2 import urlopen
+
+
+class SendfileHandler(ServerHandler):
+    """
+    Sends file wrappers with ``os.sendfile()``, and records that it did.
+    """
+
+    sent = []
+
+    def sendfile(self):
+        filelike = self.result.filelike
+        size = os.fstat(filelike.fileno()).st_size
+        self.send_headers()
+        self._flush()
+        offset = 0
+        while offset < size:
+            offset += os.sendfile(self.stdout.fileno(), filelike.fileno(),
+                                  offset, size - offset)
+        self.sent.append(filelike.name)
+        return True
+
+
+class RequestHandler(WSGIRequestHandler):
+
+    def handle(self):
+        self.raw_requestline = self.rfile.readline(65537)
+        if not self.parse_request():
+            return
+        handler = SendfileHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ())
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+    def log_message(self, *args):
+        pass
+
+
+class FileApp(object):
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.closed = []
+        self.config = []
+
+    def __call__(self, environ, start_response):
+        self.config.append(CONFIG['setting'])
+        f = open(self.filename, 'rb')
+        original_close = f.close
+
+        def close():
+            self.closed.append(self.filename)
+            original_close()
+        start_response('200 OK', [
+            ('Content-type', 'application/octet-stream'),
+            ('Content-length', str(os.path.getsize(self.filename)))])
+        wrapper = environ['wsgi.file_wrapper'](f)
+        wrapper.close = close
+        return wrapper
+
+
+def serve_once(app, path):
+    server = make_server('127.0.0.1', 0, app, handler_class=RequestHandler)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    try:
+        response = urlopen('http://127.0.0.1:%s%s'
+                           % (server.server_port, path))
+        try:
+            return response.read()
+        finally:
+            response.close()
+    finally:
+        thread.join()
+        server.server_close()
+
+
+def test_sendfile_through_middleware():
+    if not hasattr(os, 'sendfile'):
+        raise SkipTest
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'download.bin')
+        content = os.urandom(256 * 1024)
+        with open(filename, 'wb') as f:
+            f.write(content)
+        file_app = FileApp(filename)
+        app = PrefixMiddleware(
+            ConfigMiddleware(file_app, {'setting': 'value'}),
+            prefix='/static')
+        SendfileHandler.sent[:] = []
+        body = serve_once(app, '/static/download.bin')
+        eq_(body, content)
+        eq_(SendfileHandler.sent, [filename])
+        eq_(file_app.config, ['value'])
+        eq_(file_app.closed, [filename])
+    finally:
+        shutil.rmtree(directory)
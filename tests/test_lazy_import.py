@@ -0,0 +1,50 @@
+import sys
+
+from nose.tools import eq_, assert_raises
+
+from paste.deploy import appconfig, loadapp
+from paste.deploy.loadwsgi import APP, loadcontext
+from paste.deploy.plan import ContextPlan
+from tests.fixture import *
+import fakeapp.apps
+
+
+here = os.path.dirname(__file__)
+config_uri = 'config:sample_configs/test_lazy.ini'
+
+
+def test_appconfig_does_not_import():
+    eq_(appconfig(config_uri, 'explicit', relative_to=here)['setting'],
+        'explicit')
+    eq_(appconfig(config_uri, 'call', relative_to=here)['setting'], 'call')
+    assert 'tests.not_a_module' not in sys.modules
+
+
+def test_context_imports_on_create():
+    context = loadcontext(APP, config_uri, relative_to=here)
+    eq_(context.app_context.object_spec, 'tests.not_a_module:make_app')
+    assert not context.app_context.object_loaded
+    plan = ContextPlan.from_context(context)
+    eq_(plan.children['filter_contexts'][0].object_spec,
+        'tests.not_a_module:make_filter')
+    assert_raises(ImportError, context.create)
+    assert_raises(ImportError, loadapp, config_uri, 'call', relative_to=here)
+
+
+def test_egg_context():
+    context = loadcontext(APP, 'egg:FakeApp#basic_app')
+    assert not context.object_loaded
+    eq_(context.object_spec, 'fakeapp.apps:make_basic_app')
+    assert context.object is fakeapp.apps.make_basic_app
+    assert context.object_loaded
+    context.object = None
+    assert context.object is None
+
+
+def test_plan_context_imports_on_create():
+    context = loadcontext(APP, config_uri, relative_to=here)
+    copied = ContextPlan.from_context(context).to_context()
+    assert not copied.app_context.object_loaded
+    assert not copied.filter_contexts[0].object_loaded
+    eq_(copied.app_context.object_spec, 'tests.not_a_module:make_app')
+    assert_raises(ImportError, copied.create)
@@ -0,0 +1,149 @@
+import tempfile
+import time
+
+from nose.tools import eq_, assert_raises
+
+from paste.deploy import appconfig
+from paste.deploy.loadwsgi import (
+    ConfigLoader, ConfigCache, LazyConfigFile, APP)
+from tests.fixture import *
+
+
+here = os.path.dirname(__file__)
+config_path = os.path.join(here, 'sample_configs')
+
+LARGE_CONFIG = '''\
+# A config with sections that would not parse
+[DEFAULT]
+root = /srv
+
+[pipeline:main]
+pipeline = egg filtered
+
+[filter:egg]
+use = egg:FakeApp#caps
+
+[filter-app:filtered]
+use = egg:FakeApp#caps
+next = fromuse
+
+[app:fromuse]
+use = base
+setting = %(root)s/main
+filter-with = egg
+
+[app:base]
+use = egg:FakeApp#configed
+[app:app]
+use = egg:FakeApp#basic_app
+
+[app:broken]
+this line makes the section unparseable
+'''
+
+
+def write_config(text):
+    fd, filename = tempfile.mkstemp(suffix='.ini')
+    os.close(fd)
+    with open(filename, 'w') as f:
+        f.write(text)
+    return filename
+
+
+def test_only_reachable_sections_are_parsed():
+    filename = write_config(LARGE_CONFIG)
+    try:
+        assert_raises(Exception, ConfigLoader, filename, lazy=False)
+        loader = ConfigLoader(filename, cache=False, lazy=True)
+        eq_(loader.lazy.sections,
+            ['pipeline:main', 'filter:egg', 'filter-app:filtered',
+             'app:fromuse', 'app:base', 'app:app', 'app:broken'])
+        context = loader.get_context(APP)
+        context.create()
+        eq_(sorted(loader.lazy.parsed),
+            ['app:base', 'app:fromuse', 'filter-app:filtered', 'filter:egg',
+             'pipeline:main'])
+        eq_(loader.parser.defaults()['root'], '/srv')
+        fromuse = loader.get_context(APP, 'fromuse')
+        eq_(fromuse.local_conf['setting'], '/srv/main')
+        assert_raises(Exception, loader.get_context, APP, 'broken')
+    finally:
+        os.unlink(filename)
+
+
+def test_same_result_as_eager():
+    filename = os.path.join(config_path, 'test_config.ini')
+    eager = ConfigLoader(filename, cache=False, lazy=False)
+    lazy = ConfigLoader(filename, cache=False, lazy=True)
+    eq_(lazy.lazy.sections, eager.parser.sections())
+    for name in ('test1', 'test2', 'test3', 'test_get'):
+        eager_context = eager.get_context(APP, name)
+        lazy_context = lazy.get_context(APP, name)
+        eq_(lazy_context.config(), eager_context.config())
+    eq_(lazy.parser.defaults(), eager.parser.defaults())
+
+
+def test_threshold():
+    filename = os.path.join(config_path, 'test_config.ini')
+    # Lazy loading is opt-in
+    eq_(ConfigLoader.lazy_threshold, None)
+    assert ConfigLoader(filename, cache=False).lazy is None
+    old = ConfigLoader.lazy_threshold
+    ConfigLoader.lazy_threshold = 0
+    try:
+        assert ConfigLoader(filename, cache=False).lazy is not None
+        assert ConfigLoader(filename, cache=False, lazy=False).lazy is None
+        conf = appconfig('config:test_config.ini', name='test1',
+                         relative_to=config_path)
+        eq_(conf.local_conf['setting1'], 'foo')
+    finally:
+        ConfigLoader.lazy_threshold = old
+
+
+def test_scan_is_cached():
+    filename = write_config(LARGE_CONFIG)
+    cache = ConfigCache()
+    try:
+        first = ConfigLoader(filename, cache=cache, lazy=True)
+        first.get_context(APP, 'fromuse')
+        second = ConfigLoader(filename, cache=cache, lazy=True)
+        assert second.lazy is first.lazy
+        eq_(sorted(second.lazy.parsed),
+            ['app:base', 'app:fromuse', 'filter:egg'])
+        with open(filename, 'w') as f:
+            f.write(LARGE_CONFIG.replace(
+                'this line makes the section unparseable', 'x = y'))
+        eager = ConfigLoader(filename, cache=cache, lazy=False)
+        eq_(eager.lazy, None)
+        eq_(eager.parser.get('app:broken', 'x'), 'y')
+    finally:
+        os.unlink(filename)
+
+
+def test_changed_file():
+    filename = write_config(LARGE_CONFIG)
+    try:
+        loader = ConfigLoader(filename, cache=False, lazy=True)
+        time.sleep(0.01)
+        with open(filename, 'a') as f:
+            f.write('\n[app:added]\nuse = egg:FakeApp#basic_app\n')
+        assert_raises(IOError, loader.get_context, APP, 'app')
+    finally:
+        os.unlink(filename)
+
+
+def test_scan():
+    filename = write_config('; comment\n[DEFAULT]\na = 1\n'
+                            '[one]\nb = 2\n  [not a section]\n'
+                            '[DEFAULT]\nc = 3\n')
+    try:
+        lazy = LazyConfigFile(filename)
+        eq_(lazy.sections, ['one'])
+        eq_(lazy.defaults(), {'a': '1', 'c': '3'})
+        options = dict(lazy.options('one'))
+        # Python 2's ConfigParser keeps the section name with the options
+        options.pop('__name__', None)
+        eq_(options, {'b': '2\n[not a section]'})
+        eq_(lazy.parsed, ['one'])
+    finally:
+        os.unlink(filename)
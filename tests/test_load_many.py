@@ -0,0 +1,94 @@
+import multiprocessing
+
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+
+from paste.deploy import load_many, loadapp, LoadResult
+from paste.deploy.compat import futures
+from paste.deploy.loadwsgi import FILTER, InstanceRegistry
+from tests.fixture import *
+import fakeapp.apps
+import fakeapp.configapps as fc
+
+
+def setup_module():
+    if futures is None:
+        # Python 2 without the futures backport
+        raise SkipTest
+
+
+here = os.path.dirname(__file__)
+config_path = os.path.join(here, 'sample_configs')
+
+URIS = ['config:test_config.ini#test1', 'config:test_config.ini#test2',
+        'config:basic_app.ini', 'config:test_filter.ini#piped',
+        'config:test_error.ini', 'config:does_not_exist.ini']
+
+
+def check_results(results):
+    eq_(list(results), URIS)
+    for uri, result in results.items():
+        eq_(result.uri, uri)
+    assert isinstance(results[URIS[0]].object, fc.SimpleApp)
+    eq_(results[URIS[0]].object.local_conf['setting1'], 'foo')
+    assert isinstance(results[URIS[1]].object, fc.SimpleApp)
+    assert results[URIS[2]].object is fakeapp.apps.basic_app
+    eq_(results[URIS[3]].object.app, fakeapp.apps.basic_app)
+    for uri in URIS[:4]:
+        eq_(results[uri].error, None)
+    for uri in URIS[4:]:
+        eq_(results[uri].object, None)
+        assert results[uri].error is not None
+    assert 'test_error.ini' in str(results[URIS[4]].error)
+    assert_raises(IOError, results[URIS[5]].get)
+
+
+def test_threads():
+    results = load_many(URIS, workers=4, relative_to=config_path)
+    check_results(results)
+    eq_(results[URIS[0]].get(), results[URIS[0]].object)
+
+
+def test_executor():
+    executor = futures.ThreadPoolExecutor(max_workers=2)
+    try:
+        check_results(load_many(URIS, executor=executor,
+                                relative_to=config_path))
+        # The executor is left running
+        eq_(executor.submit(len, 'abc').result(), 3)
+    finally:
+        executor.shutdown()
+
+
+def test_processes():
+    if not hasattr(multiprocessing, 'get_context'):
+        raise SkipTest
+    executor = futures.ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context('fork'))
+    try:
+        check_results(load_many(URIS, executor=executor,
+                                relative_to=config_path))
+    finally:
+        executor.shutdown()
+
+
+def test_shared():
+    registry = InstanceRegistry()
+    uris = ['config:test_config.ini#test1'] * 3 + [
+        'config:test_config.ini#test1']
+    results = load_many(uris, relative_to=config_path, shared=registry)
+    eq_(list(results), ['config:test_config.ini#test1'])
+    assert (results['config:test_config.ini#test1'].object
+            is loadapp('config:test_config.ini#test1',
+                       relative_to=config_path, shared=registry))
+
+
+def test_filters():
+    results = load_many(['egg:FakeApp#caps'], object_type=FILTER)
+    filt = results['egg:FakeApp#caps'].get()
+    eq_(filt(fakeapp.apps.basic_app).app, fakeapp.apps.basic_app)
+
+
+def test_repr():
+    assert 'error=' in repr(LoadResult('config:x.ini', error=IOError('x')))
+    assert repr(LoadResult('config:x.ini', object=1)).endswith(' 1>')
@@ -0,0 +1,95 @@
+import sys
+import threading
+
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+
+from paste.deploy import loadapp, loadwsgi
+from paste.deploy.loadwsgi import InstanceRegistry
+from tests.fixture import *
+
+
+here = os.path.dirname(__file__)
+config_uri = 'config:sample_configs/test_parallel.ini'
+
+# Each factory waits here for the other one, so loading only succeeds
+# when they run at the same time.
+barrier = None
+calls = []
+
+
+def make_slow_app(global_conf, **local_conf):
+    calls.append(('app', threading.current_thread().name))
+    barrier.wait()
+
+    def slow_app(environ, start_response):
+        start_response('200 OK', [('Content-type', 'text/plain')])
+        return ['slow']
+    return slow_app
+
+
+def make_slow_filter(global_conf, **local_conf):
+    calls.append(('filter', threading.current_thread().name))
+    barrier.wait()
+
+    def slow_filter(app):
+        slow_filter.app = app
+        return slow_filter
+    return slow_filter
+
+
+def reset():
+    global barrier
+    if loadwsgi.futures is None or not hasattr(threading, 'Barrier'):
+        # Python 2
+        raise SkipTest
+    barrier = threading.Barrier(2, timeout=5)
+    del calls[:]
+
+
+def test_pipeline_created_concurrently():
+    reset()
+    app = loadapp(config_uri, relative_to=here, workers=2)
+    eq_(app.app.__name__, 'slow_app')
+    eq_(sorted(kind for kind, thread in calls), ['app', 'filter'])
+    assert threading.current_thread().name not in [t for k, t in calls]
+
+
+def test_filter_with_created_concurrently():
+    reset()
+    app = loadapp(config_uri + '#filtered', relative_to=here, workers=2)
+    eq_(app.app.__name__, 'slow_app')
+
+
+def test_sequential_without_workers():
+    reset()
+    barrier.abort()
+    assert_raises(threading.BrokenBarrierError,
+                  loadapp, config_uri, relative_to=here)
+
+
+def test_workers_with_registry():
+    reset()
+    registry = InstanceRegistry()
+    app = loadapp(config_uri, relative_to=here, workers=2, shared=registry)
+    eq_(len(registry), 2)
+    again = loadapp(config_uri + '#slow_app', relative_to=here,
+                    shared=registry)
+    assert again is app.app
+
+
+def test_workers_need_futures():
+    del calls[:]
+    futures = loadwsgi.futures
+    loadwsgi.futures = None
+    try:
+        try:
+            loadapp(config_uri, relative_to=here, workers=2)
+        except RuntimeError:
+            e = sys.exc_info()[1]
+            assert 'concurrent.futures' in str(e), str(e)
+        else:
+            assert False, 'Should have raised RuntimeError'
+        eq_(calls, [])
+    finally:
+        loadwsgi.futures = futures
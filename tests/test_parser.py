@@ -0,0 +1,127 @@
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+
+from paste.deploy.compat import (
+    StringIO, BasicInterpolation, InterpolationMissingOptionError,
+    InterpolationSyntaxError)
+from paste.deploy.loadwsgi import NicerConfigParser, ConfigLoader
+from tests.fixture import *
+
+
+def make_parser(text, defaults=None):
+    parser = NicerConfigParser('test.ini', defaults=defaults)
+    parser.optionxform = str
+    parser.read_file(StringIO(text))
+    return parser
+
+
+def test_defaults_are_memoized():
+    parser = make_parser('[DEFAULT]\nbase = /srv\npath = %(base)s/app\n')
+    eq_(parser.defaults(), {'base': '/srv', 'path': '/srv/app'})
+    calls = []
+    original_get = parser.get
+
+    def counting_get(*args, **kw):
+        calls.append(args)
+        return original_get(*args, **kw)
+    parser.get = counting_get
+    parser.defaults()
+    eq_(calls, [])
+
+
+def test_defaults_returns_a_copy():
+    parser = make_parser('[DEFAULT]\nbase = /srv\n')
+    parser.defaults()['base'] = 'changed'
+    eq_(parser.defaults()['base'], '/srv')
+
+
+def test_defaults_invalidated_on_change():
+    parser = make_parser('[DEFAULT]\nbase = /srv\npath = %(base)s/app\n')
+    eq_(parser.defaults()['path'], '/srv/app')
+    parser.set('DEFAULT', 'base', '/opt')
+    eq_(parser.defaults()['path'], '/opt/app')
+    parser.read_file(StringIO('[DEFAULT]\nbase = /var\n'))
+    eq_(parser.defaults()['path'], '/var/app')
+    parser.remove_option('DEFAULT', 'path')
+    assert 'path' not in parser.defaults()
+
+
+def test_update_defaults_invalidates():
+    filename = os.path.join(os.path.dirname(__file__), 'sample_configs',
+                            'test_config.ini')
+    loader = ConfigLoader(filename)
+    eq_(loader.parser.defaults()['def1'], 'a')
+    loader.update_defaults({'def1': 'changed'})
+    eq_(loader.parser.defaults()['def1'], 'changed')
+    loader.update_defaults({'def1': 'ignored', 'new': 'x'}, overwrite=False)
+    eq_(loader.parser.defaults()['def1'], 'changed')
+    eq_(loader.parser.defaults()['new'], 'x')
+
+
+def requires_compiled_interpolation():
+    # CompiledInterpolation replaces BasicInterpolation, which only
+    # exists on Python 3
+    if BasicInterpolation is None:
+        raise SkipTest
+
+
+def test_interpolation():
+    requires_compiled_interpolation()
+    parser = make_parser(
+        '[DEFAULT]\nroot = /srv\nlog = %(root)s/%(name)s.log\n'
+        '[app:main]\nname = main\npercent = 100%%\n'
+        'nested = [%(log)s]\n')
+    eq_(parser.get('app:main', 'log'), '/srv/main.log')
+    eq_(parser.get('app:main', 'nested'), '[/srv/main.log]')
+    eq_(parser.get('app:main', 'percent'), '100%')
+    eq_(parser.get('app:main', 'nested', vars={'root': '/opt'}),
+        '[/opt/main.log]')
+    eq_(parser.get('app:main', 'nested', raw=True), '[%(log)s]')
+
+
+def test_interpolation_is_memoized():
+    requires_compiled_interpolation()
+    parser = make_parser('[DEFAULT]\nbase = /srv\n'
+                         '[app:main]\npath = %(base)s/app\n')
+    eq_(parser.get('app:main', 'path'), '/srv/app')
+    eq_(parser._interpolated['app:main'], {'path': '/srv/app',
+                                           'base': '/srv'})
+    parser.set('DEFAULT', 'base', '/opt')
+    eq_(parser.get('app:main', 'path'), '/opt/app')
+    parser.read_file(StringIO('[app:main]\npath = %(base)s/other\n'))
+    eq_(parser.get('app:main', 'path'), '/opt/other')
+
+
+def test_deep_interpolation():
+    requires_compiled_interpolation()
+    lines = ['[DEFAULT]', 'v0 = x']
+    lines.extend('v%s = %%(v%s)s%%(v%s)s' % (i, i - 1, i - 1)
+                 for i in range(1, 40))
+    parser = make_parser('\n'.join(lines) + '\n')
+    eq_(parser.get('DEFAULT', 'v20'), 'x' * 2 ** 20)
+
+
+def test_interpolation_cycle():
+    requires_compiled_interpolation()
+    parser = make_parser('[app:main]\na = %(b)s\nb = x %(c)s\n'
+                         'c = %(a)s\nd = %(a)s\n')
+    for option in ('a', 'd'):
+        try:
+            parser.get('app:main', option)
+        except Exception:
+            e = sys.exc_info()[1]
+            message = str(e)
+            assert message.startswith('Error in file test.ini: '), message
+            assert 'a -> b -> c -> a' in message, message
+            assert 'Circular reference in section [app:main]' in message
+        else:
+            assert False, 'Should have raised an exception'
+
+
+def test_interpolation_errors():
+    requires_compiled_interpolation()
+    parser = make_parser('[app:main]\nmissing = %(nothing)s\nbad = 5%\n')
+    assert_raises(InterpolationMissingOptionError,
+                  parser.get, 'app:main', 'missing')
+    assert_raises(InterpolationSyntaxError, parser.get, 'app:main', 'bad')
+    assert_raises(ValueError, parser.set, 'app:main', 'other', '%(x')
@@ -0,0 +1,190 @@
+import multiprocessing
+import pickle
+import shutil
+import tempfile
+
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+
+from paste.deploy import loadapp, timing
+from paste.deploy.compat import futures
+from paste.deploy.loadwsgi import (
+    APP, InstanceRegistry, LoaderContext, loadcontext)
+from paste.deploy.plan import ContextPlan, ResolutionCache, loadplan
+from tests.fixture import *
+import fakeapp.apps
+import fakeapp.configapps
+
+
+here = os.path.dirname(__file__)
+config_path = os.path.join(here, 'sample_configs')
+
+
+def setup_module():
+    global tmp_dir, work_dir, cache_dir
+    tmp_dir = tempfile.mkdtemp()
+    work_dir = os.path.join(tmp_dir, 'configs')
+    cache_dir = os.path.join(tmp_dir, 'cache')
+    shutil.copytree(config_path, work_dir)
+
+
+def teardown_module():
+    shutil.rmtree(tmp_dir)
+
+
+def phases(load_trace):
+    return set(span.phase for depth, span in load_trace.spans())
+
+
+def test_plan_round_trip():
+    context = loadcontext(APP, 'config:test_config.ini#test3',
+                          relative_to=config_path)
+    plan = ContextPlan.from_context(context)
+    eq_(plan.object_spec, 'fakeapp.configapps:SimpleApp.make_app')
+    eq_(plan.section, 'app:test3')
+    eq_(ContextPlan.from_dict(plan.to_dict()), plan)
+    app = plan.create()
+    assert isinstance(app, fakeapp.configapps.SimpleApp)
+    eq_(app.global_conf, context.global_conf)
+    eq_(app.local_conf, context.local_conf)
+
+
+def test_pipeline_plan():
+    context = loadcontext(APP, 'config:test_filter.ini#piped',
+                          relative_to=config_path)
+    plan = ContextPlan.from_context(context)
+    eq_(sorted(plan.children), ['app_context', 'filter_contexts'])
+    app = plan.create()
+    assert isinstance(app, fakeapp.apps.CapFilter)
+    assert app.app is fakeapp.apps.basic_app
+
+
+def test_cache_skips_parsing():
+    cache = ResolutionCache(cache_dir)
+    uri = 'config:test_config.ini#test3'
+    with timing.trace() as first:
+        app1 = loadapp(uri, relative_to=work_dir, resolution_cache=cache)
+    assert 'parse' in phases(first)
+    with timing.trace() as second:
+        app2 = loadapp(uri, relative_to=work_dir, resolution_cache=cache)
+    eq_(phases(second), set(['import', 'create']))
+    eq_(app1.global_conf, app2.global_conf)
+    eq_(app1.local_conf, app2.local_conf)
+
+
+def test_unwritable_cache():
+    not_a_directory = os.path.join(tmp_dir, 'cache_file')
+    with open(not_a_directory, 'w') as f:
+        f.write('not a directory')
+    for i in range(2):
+        app = loadapp('config:test_config.ini#test1', relative_to=work_dir,
+                      resolution_cache=not_a_directory)
+        eq_(app.local_conf['setting1'], 'foo')
+
+
+def test_changed_include_invalidates():
+    uri = 'config:test_config.ini#test_foreign_config'
+    app = loadapp(uri, relative_to=work_dir, resolution_cache=cache_dir)
+    eq_(app.local_conf['bob'], 'your uncle')
+    included = os.path.join(work_dir, 'test_config_included.ini')
+    with open(included) as f:
+        body = f.read()
+    with open(included, 'w') as f:
+        f.write(body.replace('your uncle', 'your aunt'))
+    app = loadapp(uri, relative_to=work_dir, resolution_cache=cache_dir)
+    eq_(app.local_conf['bob'], 'your aunt')
+
+
+def test_edit_while_resolving_is_not_cached():
+    import paste.deploy.plan
+    filename = os.path.join(work_dir, 'edited.ini')
+    with open(filename, 'w') as f:
+        f.write('[app:main]\nuse = egg:FakeApp#configed\nname = old\n')
+
+    def edit_after_loading(*args, **kw):
+        context = loadcontext(*args, **kw)
+        with open(filename, 'w') as f:
+            f.write('[app:main]\nuse = egg:FakeApp#configed\n'
+                    'name = newer\n')
+        return context
+    paste.deploy.plan.loadcontext = edit_after_loading
+    try:
+        context = ResolutionCache(cache_dir).load_context(
+            APP, 'config:edited.ini', relative_to=work_dir)
+    finally:
+        paste.deploy.plan.loadcontext = loadcontext
+    eq_(context.local_conf['name'], 'old')
+    app = loadapp('config:edited.ini', relative_to=work_dir,
+                  resolution_cache=cache_dir)
+    eq_(app.local_conf['name'], 'newer')
+
+
+def test_composite_from_cache():
+    uri = 'config:basic_app.ini#remote_addr'
+    for i in range(2):
+        app = loadapp(uri, relative_to=work_dir, resolution_cache=cache_dir)
+        assert isinstance(app, fakeapp.apps.RemoteAddrDispatch)
+        assert app.map['127.0.0.1'] is fakeapp.apps.basic_app
+        assert app.map['0.0.0.0'] is fakeapp.apps.basic_app2
+
+
+def test_environment_variable():
+    env_cache_dir = os.path.join(tmp_dir, 'env_cache')
+    os.environ['PASTE_DEPLOY_RESOLUTION_CACHE'] = env_cache_dir
+    try:
+        loadapp('config:test_filter.ini#filt', relative_to=work_dir)
+    finally:
+        del os.environ['PASTE_DEPLOY_RESOLUTION_CACHE']
+    eq_(len(os.listdir(env_cache_dir)), 1)
+    ResolutionCache(env_cache_dir).clear()
+    eq_(os.listdir(env_cache_dir), [])
+
+
+def test_unplannable_context():
+    context = LoaderContext(fakeapp.apps.make_basic_app, APP,
+                            'paste.app_factory', {}, {}, None)
+    assert_raises(ValueError, ContextPlan.from_context, context)
+    context.object_spec = 'fakeapp.apps:make_basic_app'
+    context.global_conf = {'obj': object()}
+    assert_raises(ValueError, ContextPlan.from_context, context)
+    context.global_conf = {}
+    assert ContextPlan.from_context(context).create() is fakeapp.apps.basic_app
+
+
+def create_class_name(plan):
+    return plan.create().__class__.__name__
+
+
+def test_loadplan_is_picklable():
+    if futures is None:
+        raise SkipTest
+    plan = loadplan(APP, 'config:test_filter.ini#piped',
+                    relative_to=config_path)
+    copied = pickle.loads(pickle.dumps(plan, pickle.HIGHEST_PROTOCOL))
+    eq_(copied, plan)
+    app = copied.create(workers=2)
+    assert isinstance(app, fakeapp.apps.CapFilter)
+    assert app.app is fakeapp.apps.basic_app
+
+
+def test_plan_in_worker_processes():
+    if not hasattr(multiprocessing, 'get_context'):
+        # Python < 3.4
+        raise SkipTest
+    plan = loadplan(APP, 'config:test_config.ini#test2',
+                    relative_to=config_path)
+    pool = multiprocessing.get_context('fork').Pool(2)
+    try:
+        eq_(pool.map(create_class_name, [plan, plan]),
+            ['SimpleApp', 'SimpleApp'])
+    finally:
+        pool.close()
+        pool.join()
+
+
+def test_plan_create_shared():
+    plan = loadplan(APP, 'config:test_config.ini#test1',
+                    relative_to=config_path)
+    registry = InstanceRegistry()
+    assert plan.create(shared=registry) is plan.create(shared=registry)
+    assert plan.create() is not plan.create()
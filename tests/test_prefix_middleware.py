@@ -0,0 +1,113 @@
+from nose.tools import eq_
+
+from paste.deploy.config import PrefixMiddleware, parse_forwarded
+
+
+def call(environ, **kw):
+    seen = {}
+
+    def app(environ, start_response):
+        seen.update(environ)
+        return []
+    base = {'PATH_INFO': '/james/orders/1', 'SCRIPT_NAME': '',
+            'wsgi.url_scheme': 'http', 'HTTP_HOST': 'backend:8080',
+            'REMOTE_ADDR': '10.0.0.1'}
+    base.update(environ)
+    PrefixMiddleware(app, **kw)(base, None)
+    return seen
+
+
+def test_prefix():
+    environ = call({}, prefix='/james/')
+    eq_(environ['SCRIPT_NAME'], '/james')
+    eq_(environ['PATH_INFO'], '/orders/1')
+    eq_(call({'PATH_INFO': '/james'}, prefix='/james')['PATH_INFO'], '/')
+    eq_(call({'PATH_INFO': '/other'}, prefix='/james')['PATH_INFO'],
+        '/other')
+    environ = call({}, prefix='/')
+    eq_(environ['SCRIPT_NAME'], '')
+    eq_(environ['PATH_INFO'], '/james/orders/1')
+
+
+def test_prefix_is_not_a_pattern():
+    eq_(call({'PATH_INFO': '/aXb/page'}, prefix='/a.b')['PATH_INFO'],
+        '/aXb/page')
+    eq_(call({'PATH_INFO': '/a.b/page'}, prefix='/a.b')['PATH_INFO'],
+        '/page')
+
+
+def test_x_forwarded():
+    environ = call({'HTTP_X_FORWARDED_SERVER': 'example.com,proxy',
+                    'HTTP_X_FORWARDED_FOR': '192.0.2.1, 10.0.0.2',
+                    'HTTP_X_FORWARDED_PROTO': 'https'})
+    eq_(environ['SERVER_NAME'], 'example.com')
+    eq_(environ['HTTP_HOST'], 'example.com')
+    eq_(environ['REMOTE_ADDR'], '192.0.2.1')
+    eq_(environ['wsgi.url_scheme'], 'https')
+    assert 'HTTP_X_FORWARDED_FOR' not in environ
+    environ = call({'HTTP_X_FORWARDED_HOST': 'example.com',
+                    'HTTP_X_FORWARDED_SCHEME': 'https',
+                    'HTTP_X_FORWARDED_PROTO': 'ftp'})
+    eq_(environ['HTTP_HOST'], 'example.com')
+    eq_(environ['wsgi.url_scheme'], 'https')
+    environ = call({'HTTP_X_FORWARDED_HOST': 'example.com'},
+                   translate_forwarded_server=False)
+    eq_(environ['HTTP_HOST'], 'backend:8080')
+
+
+def test_forwarded():
+    header = ('for="[2001:db8::17]:4711";proto=HTTPS;host=example.com,'
+              ' for=10.0.0.2')
+    environ = call({'HTTP_FORWARDED': header}, translate_forwarded=True)
+    eq_(environ['REMOTE_ADDR'], '2001:db8::17')
+    eq_(environ['wsgi.url_scheme'], 'https')
+    eq_(environ['HTTP_HOST'], 'example.com')
+    assert 'HTTP_FORWARDED' not in environ
+    eq_(call({'HTTP_FORWARDED': 'for="192.0.2.60:8000"'},
+             translate_forwarded=True)['REMOTE_ADDR'], '192.0.2.60')
+    eq_(call({'HTTP_FORWARDED': 'for=_hidden'},
+             translate_forwarded=True)['REMOTE_ADDR'], '10.0.0.1')
+    # X-Forwarded-* wins
+    environ = call({'HTTP_FORWARDED': 'for=192.0.2.60',
+                    'HTTP_X_FORWARDED_FOR': '192.0.2.1'},
+                   translate_forwarded=True)
+    eq_(environ['REMOTE_ADDR'], '192.0.2.1')
+
+
+def test_forwarded_is_off_by_default():
+    header = 'for=192.0.2.60;proto=https;host=evil.example.com'
+    environ = call({'HTTP_FORWARDED': header})
+    eq_(environ['REMOTE_ADDR'], '10.0.0.1')
+    eq_(environ['HTTP_HOST'], 'backend:8080')
+    eq_(environ['wsgi.url_scheme'], 'http')
+    eq_(environ['HTTP_FORWARDED'], header)
+    # Also when translating only Forwarded
+    environ = call({'HTTP_X_FORWARDED_FOR': '192.0.2.1'},
+                   translate_forwarded=True, translate_forwarded_server=False)
+    eq_(environ['REMOTE_ADDR'], '10.0.0.1')
+
+
+def test_parse_forwarded():
+    eq_(parse_forwarded('For="\\"quoted\\";x";by=proxy'),
+        {'for': '"quoted";x', 'by': 'proxy'})
+    eq_(parse_forwarded('for=a;for=b'), {'for': 'a'})
+    eq_(parse_forwarded('for=a; garbage; host=b'), {'for': 'a'})
+    eq_(parse_forwarded(''), {})
+
+
+def test_force_port_and_scheme():
+    environ = call({}, force_port='8443', scheme='https')
+    eq_(environ['HTTP_HOST'], 'backend:8443')
+    eq_(environ['SERVER_PORT'], '8443')
+    eq_(environ['wsgi.url_scheme'], 'https')
+    environ = call({'HTTP_X_FORWARDED_PROTO': 'https'}, force_port='')
+    eq_(environ['HTTP_HOST'], 'backend')
+    eq_(environ['SERVER_PORT'], '443')
+
+
+def test_make_prefix_middleware():
+    from paste.deploy.config import make_prefix_middleware
+    middleware = make_prefix_middleware(None, {}, translate_forwarded='true')
+    eq_(middleware.translate_forwarded, True)
+    middleware = make_prefix_middleware(None, {})
+    eq_(middleware.translate_forwarded, False)
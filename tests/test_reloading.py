@@ -0,0 +1,153 @@
+from __future__ import with_statement
+import shutil
+import tempfile
+
+from nose.tools import eq_
+
+from paste.deploy.compat import StringIO
+from paste.deploy.reloading import reloadapp, FileWatcher
+from tests.fixture import *
+import tests.reloadapps as reloadapps
+
+
+main_ini = '''\
+[pipeline:main]
+pipeline = header greeting
+
+[filter:header]
+use = call:tests.reloadapps:make_filter
+header = %s
+
+[app:greeting]
+use = config:apps.ini#greeting
+'''
+
+apps_ini = '''\
+[app:greeting]
+use = call:tests.reloadapps:make_app
+message = %s
+'''
+
+
+class Config(object):
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('main.ini', main_ini % 'one')
+        self.write('apps.ini', apps_ini % 'hello')
+        reloadapps.created[:] = []
+
+    def write(self, filename, content):
+        with open(os.path.join(self.directory, filename), 'w') as f:
+            f.write(content)
+
+    def remove(self):
+        shutil.rmtree(self.directory)
+
+
+def call(app):
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result['headers'] = dict(headers)
+    body = b''.join(app({}, start_response))
+    return body, result['headers'].get('X-Filter')
+
+
+def test_reload_changed_section_only():
+    config = Config()
+    try:
+        app = reloadapp('config:main.ini', relative_to=config.directory,
+                        interval=None)
+        eq_(call(app), (b'hello', 'one'))
+        eq_(reloadapps.created, [('app', 'hello'), ('filter', 'one')])
+        assert not app.check()
+        config.write('main.ini', main_ini % 'two!')
+        assert app.check()
+        eq_(app.generation, 2)
+        eq_(call(app), (b'hello', 'two!'))
+        # The app in the other file was reused
+        eq_(reloadapps.created[2:], [('filter', 'two!')])
+        config.write('apps.ini', apps_ini % 'goodbye')
+        assert app.check()
+        eq_(call(app), (b'goodbye', 'two!'))
+        eq_(reloadapps.created[3:], [('app', 'goodbye')])
+    finally:
+        config.remove()
+
+
+def test_in_flight_requests_keep_old_app():
+    config = Config()
+    try:
+        app = reloadapp('config:main.ini', relative_to=config.directory,
+                        interval=None)
+        old = app.app
+        config.write('apps.ini', apps_ini % 'changed')
+        app.reload()
+        assert app.app is not old
+        eq_(call(old), (b'hello', 'one'))
+        eq_(call(app), (b'changed', 'one'))
+    finally:
+        config.remove()
+
+
+def test_failed_reload_keeps_serving():
+    config = Config()
+    try:
+        app = reloadapp('config:main.ini', relative_to=config.directory,
+                        interval=0)
+        config.write('apps.ini', '[app:other]\nuse = egg:FakeApp#basic_app\n')
+        errors = StringIO()
+
+        def start_response(status, headers, exc_info=None):
+            pass
+        body = b''.join(app({'wsgi.errors': errors}, start_response))
+        eq_(body, b'hello')
+        assert 'Reloading config:main.ini failed' in errors.getvalue()
+        assert isinstance(app.error, LookupError)
+        eq_(app.generation, 1)
+        # Not retried until the files change again
+        assert not app.check()
+        config.write('apps.ini', apps_ini % 'fixed')
+        assert app.check()
+        eq_(call(app), (b'fixed', 'one'))
+        assert app.error is None
+    finally:
+        config.remove()
+
+
+def test_failed_reload_watches_new_files():
+    config = Config()
+    try:
+        app = reloadapp('config:main.ini', relative_to=config.directory,
+                        interval=None)
+        config.write('broken.ini', '[app:greeting]\nuse = nothing\n')
+        config.write('main.ini', main_ini.replace('apps.ini', 'broken.ini')
+                     % 'two')
+        try:
+            app.check()
+        except LookupError:
+            pass
+        else:
+            assert False, 'Should have raised LookupError'
+        eq_(app.generation, 1)
+        config.write('broken.ini', apps_ini % 'fixed')
+        assert app.check()
+        eq_(app.generation, 2)
+        eq_(call(app), (b'fixed', 'two'))
+    finally:
+        config.remove()
+
+
+def test_file_watcher():
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'watched.ini')
+        watcher = FileWatcher([filename, filename])
+        eq_(watcher.files, [filename])
+        assert not watcher.changed()
+        with open(filename, 'w') as f:
+            f.write('[app:main]\n')
+        assert watcher.changed()
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,42 @@
+import sys
+
+from nose.tools import eq_
+
+from paste.deploy.loadwsgi import ConfigLoader, APP, FILTER, SERVER
+from tests.fixture import *
+
+
+here = os.path.dirname(__file__)
+config_filename = os.path.join(here, 'sample_configs', 'test_sections.ini')
+
+
+def assert_lookup_error(loader, object_type, name, message):
+    try:
+        loader.find_config_section(object_type, name)
+    except LookupError:
+        e = sys.exc_info()[1]
+        assert message in str(e), str(e)
+    else:
+        assert False, 'Should have raised LookupError'
+
+
+def test_find_config_section():
+    loader = ConfigLoader(config_filename)
+    eq_(loader.find_config_section(APP), 'app')
+    eq_(loader.find_config_section(APP, 'other'), 'app: other ')
+    eq_(loader.find_config_section(FILTER, 'caps'), 'filter:caps')
+
+
+def test_section_index():
+    loader = ConfigLoader(config_filename)
+    index = loader.section_index()
+    eq_(index[('app', 'other')], ['app: other '])
+    eq_(index[('app', None)], ['app'])
+    assert loader.section_index() is index
+
+
+def test_missing_and_ambiguous_sections():
+    loader = ConfigLoader(config_filename)
+    assert_lookup_error(loader, APP, 'missing', "No section 'missing'")
+    assert_lookup_error(loader, SERVER, None, "No section None")
+    assert_lookup_error(loader, APP, 'dup', "Ambiguous section names")
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from nose.tools import eq_
+
+from paste.deploy import loadapp
+from paste.deploy.loadwsgi import (
+    APP, InstanceRegistry, LoaderContext, shared_instances)
+from tests.fixture import *
+import fakeapp.apps
+import fakeapp.configapps
+
+
+here = os.path.dirname(__file__)
+config_uri = 'config:sample_configs/test_shared.ini'
+
+
+def test_not_shared_by_default():
+    app = loadapp(config_uri, relative_to=here)
+    assert isinstance(app, fakeapp.apps.RemoteAddrDispatch)
+    assert app.map['127.0.0.1'].app is not app.map['0.0.0.0'].app
+
+
+def test_shared_within_load():
+    app = loadapp(config_uri, relative_to=here, shared=InstanceRegistry())
+    api = app.map['127.0.0.1'].app
+    assert isinstance(api, fakeapp.configapps.SimpleApp)
+    assert app.map['0.0.0.0'].app is api
+    # The filters wrap the same app, but are separate objects
+    assert isinstance(app.map['0.0.0.0'], fakeapp.apps.CapFilter)
+
+
+def test_shared_between_loads():
+    registry = InstanceRegistry()
+    app1 = loadapp(config_uri, relative_to=here, shared=registry)
+    app2 = loadapp(config_uri, relative_to=here, shared=registry)
+    assert app1 is app2
+    api = loadapp(config_uri + '#api', relative_to=here, shared=registry)
+    assert app1.map['127.0.0.1'].app is api
+    app3 = loadapp(config_uri, relative_to=here, shared=InstanceRegistry())
+    assert app3 is not app1
+
+
+def test_different_conf_not_shared():
+    registry = InstanceRegistry()
+    api = loadapp(config_uri + '#api', relative_to=here, shared=registry)
+    other = loadapp(config_uri + '#other_api', relative_to=here,
+                    shared=registry)
+    assert api is not other
+    assert other.global_conf['extra'] == 'value'
+
+
+def test_process_wide_registry():
+    shared_instances.clear()
+    try:
+        api1 = loadapp(config_uri + '#api', relative_to=here, shared=True)
+        api2 = loadapp(config_uri + '#api', relative_to=here, shared=True)
+        assert api1 is api2
+        assert len(shared_instances) == 1
+    finally:
+        shared_instances.clear()
+
+
+created = []
+creating = threading.Event()
+finish = threading.Event()
+
+
+def make_slow_app(global_conf, **local_conf):
+    created.append(local_conf['name'])
+    creating.set()
+    finish.wait(5)
+    if local_conf.get('fail'):
+        raise ValueError('failed to create %s' % local_conf['name'])
+    return fakeapp.configapps.SimpleApp(
+        global_conf, local_conf, local_conf['name'])
+
+
+def create_concurrently(registry, local_conf):
+    del created[:]
+    creating.clear()
+    finish.clear()
+    results = []
+
+    def create():
+        context = LoaderContext(make_slow_app, APP, 'paste.app_factory',
+                                {}, dict(local_conf), None)
+        try:
+            results.append(registry.create(context))
+        except ValueError:
+            results.append(None)
+    threads = [threading.Thread(target=create) for i in range(3)]
+    threads[0].start()
+    creating.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    # Give the other threads time to ask for the object
+    time.sleep(0.1)
+    finish.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_created_once_by_concurrent_loads():
+    registry = InstanceRegistry()
+    results = create_concurrently(registry, {'name': 'api'})
+    eq_(created, ['api'])
+    eq_(len(results), 3)
+    assert results[0] is results[1] is results[2]
+    eq_(len(registry), 1)
+
+
+def test_failed_creation_is_retried():
+    registry = InstanceRegistry()
+    results = create_concurrently(registry, {'name': 'api', 'fail': 'true'})
+    eq_(created, ['api'] * 3)
+    eq_(results, [None] * 3)
+    eq_(len(registry), 0)
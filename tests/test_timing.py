@@ -0,0 +1,170 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+
+from nose.tools import eq_
+from nose.plugins.skip import SkipTest
+
+from paste.deploy import loadapp, timing
+from paste.deploy.compat import futures
+from paste.deploy.loadwsgi import ConfigLoader
+from tests.fixture import *
+
+
+here = os.path.dirname(__file__)
+config_uri = 'config:sample_configs/test_config.ini'
+
+
+def load_traced(name):
+    with timing.trace() as load_trace:
+        loadapp(config_uri, relative_to=here, name=name)
+    return load_trace
+
+
+def test_phases_recorded():
+    load_trace = load_traced('test3')
+    phases = set(span.phase for depth, span in load_trace.spans())
+    eq_(phases, set(['parse', 'resolve', 'import', 'create']))
+    totals = load_trace.totals()
+    eq_(sorted(totals), ['create', 'import', 'parse', 'resolve'])
+    assert all(value >= 0 for value in totals.values())
+
+
+def test_use_chain_is_nested():
+    load_trace = load_traced('test3')
+    resolves = [(depth, span.name) for depth, span in load_trace.spans()
+                if span.phase == 'resolve']
+    eq_([name.split('#', 1)[1] for depth, name in resolves],
+        ['test3', 'test2', 'egg:FakeApp#configed', 'configed'])
+    eq_(resolves[-1][1], 'egg:FakeApp#configed')
+    depths = [depth for depth, name in resolves]
+    eq_(depths, sorted(depths))
+    assert depths[0] < depths[-1]
+
+
+def test_create_names_section():
+    load_trace = load_traced('test1')
+    creates = [span for depth, span in load_trace.spans()
+               if span.phase == 'create']
+    eq_(len(creates), 1)
+    assert creates[0].name.startswith('[app:test1] in '), creates[0].name
+    assert 'test1' in load_trace.format()
+
+
+def test_no_trace():
+    assert timing.span('parse', 'x').__enter__() is None
+    load_trace = timing.LoadTrace()
+    loadapp(config_uri, relative_to=here, name='test1')
+    eq_(load_trace.roots, [])
+
+
+def test_names_only_made_when_recorded():
+    names = []
+
+    def name():
+        names.append('made')
+        return 'lazy'
+    with timing.span('create', name):
+        pass
+    eq_(names, [])
+    with timing.trace() as load_trace:
+        with timing.span('create', name):
+            pass
+    eq_(names, ['made'])
+    eq_([span.name for depth, span in load_trace.spans()], ['lazy'])
+
+
+def test_chrome_trace():
+    load_trace = load_traced('test1')
+    data = load_trace.to_chrome_trace()
+    events = data['traceEvents']
+    assert events
+    for event in events:
+        eq_(event['ph'], 'X')
+        assert event['dur'] >= 0
+    eq_(set(event['cat'] for event in events),
+        set(['parse', 'resolve', 'import', 'create']))
+    json.dumps(data)
+
+
+def test_environment_variable():
+    tmp_dir = tempfile.mkdtemp()
+    filename = os.path.join(tmp_dir, 'trace.json')
+    os.environ[timing.ENVIRON_KEY] = filename
+    try:
+        loadapp(config_uri, relative_to=here, name='test1')
+    finally:
+        del os.environ[timing.ENVIRON_KEY]
+    try:
+        with open(filename) as f:
+            data = json.load(f)
+        assert data['traceEvents']
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_parse_records_cache_use():
+    filename = os.path.join(here, 'sample_configs', 'test_config.ini')
+    with timing.trace() as load_trace:
+        ConfigLoader(filename, cache=False)
+    span = load_trace.roots[0]
+    eq_(span.phase, 'parse')
+    eq_(span.args['cached'], False)
+
+
+def test_traces_are_per_thread():
+    # Two loads traced at the same time in different threads must not
+    # restore each other's trace when they finish
+    entered = threading.Barrier(2, timeout=5) if hasattr(
+        threading, 'Barrier') else None
+    if entered is None:
+        raise SkipTest
+    seen = {}
+
+    def traced(name, wait_before_exit):
+        with timing.trace() as load_trace:
+            entered.wait()
+            seen[name] = timing.active() is load_trace
+            if wait_before_exit:
+                time.sleep(0.05)
+        seen[name + ' after'] = timing.active()
+
+    threads = [threading.Thread(target=traced, args=('first', False)),
+               threading.Thread(target=traced, args=('second', True))]
+    with timing.trace() as outer:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert timing.active() is outer
+    eq_(seen, {'first': True, 'second': True, 'first after': None,
+               'second after': None})
+    assert timing.active() is None
+
+
+def test_workers_record_in_callers_trace():
+    if futures is None:
+        raise SkipTest
+    with timing.trace() as load_trace:
+        loadapp('config:sample_configs/test_filter.ini#piped',
+                relative_to=here, workers=2)
+    creates = [span for depth, span in load_trace.spans()
+               if span.phase == 'create']
+    eq_(len(creates), 2)
+
+
+def test_unwritable_trace_file():
+    filename = os.path.join(here, 'does', 'not', 'exist', 'trace.json')
+    os.environ[timing.ENVIRON_KEY] = filename
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            app = loadapp(config_uri, relative_to=here, name='test1')
+    finally:
+        del os.environ[timing.ENVIRON_KEY]
+    eq_(app.local_conf['setting1'], 'foo')
+    eq_(len(caught), 1)
+    assert filename in str(caught[0].message)
@@ -0,0 +1,104 @@
+import json
+import sys
+
+from nose.tools import eq_
+
+from paste.deploy import appconfig, loadapp, timing
+from paste.deploy.loadwsgi import ConfigLoader, APP, loadcontext
+from paste.deploy.util import CopyOnWriteDict
+from tests.fixture import *
+import fakeapp.configapps as fc
+
+
+here = os.path.dirname(__file__)
+config_path = os.path.join(here, 'sample_configs')
+config_filename = os.path.join(config_path, 'test_use_chains.ini')
+
+
+def assert_circular(name, message):
+    try:
+        loadcontext(APP, 'config:%s' % config_filename, name=name)
+    except LookupError:
+        e = sys.exc_info()[1]
+        assert str(e).startswith('Circular reference: '), str(e)
+        assert message in str(e), str(e)
+    else:
+        assert False, 'Should have raised LookupError'
+
+
+def test_use_resolved_once():
+    loader = ConfigLoader(config_filename)
+    with timing.trace() as load_trace:
+        first = loader.get_context(APP, 'first')
+        second = loader.get_context(APP, 'second')
+    resolves = [span.name for depth, span in load_trace.spans()
+                if span.phase == 'resolve' and span.name.endswith('#base')]
+    eq_(len(resolves), 1)
+    eq_(first.local_conf['setting2'], 'first')
+    eq_(second.local_conf['setting2'], 'second')
+    eq_(first.local_conf['setting1'], 'base')
+    eq_(first.object, second.object)
+    assert first.local_conf is not second.local_conf
+    assert first.global_conf is not second.global_conf
+    eq_(first.section, 'app:first')
+
+
+def test_use_depends_on_global_conf():
+    loader = ConfigLoader(config_filename)
+    first = loader.get_context(APP, 'first')
+    changed = loader.get_context(APP, 'changed_globals')
+    eq_(first.global_conf['def1'], 'a')
+    eq_(changed.global_conf['def1'], 'changed')
+
+
+def test_loaded_apps():
+    app = loadapp('config:test_use_chains.ini', relative_to=config_path)
+    eq_(app.map['127.0.0.1'].local_conf,
+        {'setting1': 'base', 'setting2': 'first'})
+    eq_(app.map['0.0.0.0'].local_conf,
+        {'setting1': 'base', 'setting2': 'second'})
+    app = loadapp('config:test_use_chains.ini#filtered',
+                  relative_to=config_path)
+    assert isinstance(app.app, fc.SimpleApp)
+
+
+def test_circular_use():
+    assert_circular('loop1', '[app:loop1] in %s -> [app:loop2]'
+                    % config_filename)
+    assert_circular('loop2', '[app:loop1] in %s -> [app:loop2] in %s'
+                    % (config_filename, config_filename))
+    assert_circular('self', '[app:self] in %s -> [app:self] in %s'
+                    % (config_filename, config_filename))
+
+
+def test_circular_use_across_files():
+    assert_circular('other_file', '[app:back] in %s'
+                    % os.path.join(config_path, 'test_use_chains_other.ini'))
+
+
+def test_shared_global_conf():
+    loader = ConfigLoader(config_filename)
+    first = loader.get_context(APP, 'first')
+    second = loader.get_context(APP, 'second')
+    changed = loader.get_context(APP, 'changed_globals')
+    assert isinstance(first._global_conf, CopyOnWriteDict)
+    assert first._global_conf.base is second._global_conf.base
+    eq_(first.global_conf, second.global_conf)
+    eq_(changed.global_conf['def1'], 'changed')
+    eq_(first.global_conf['def1'], 'a')
+
+
+def test_factories_get_dicts():
+    app = loadapp('config:test_use_chains.ini#first', relative_to=config_path)
+    eq_(type(app.global_conf), dict)
+    eq_(app.global_conf['def1'], 'a')
+
+
+def test_appconfig_gives_dicts():
+    conf = appconfig('config:test_use_chains.ini#first',
+                     relative_to=config_path)
+    eq_(type(conf.global_conf), dict)
+    eq_(type(conf.local_conf), dict)
+    eq_(type(conf.context.global_conf), dict)
+    eq_(type(conf.context.local_conf), dict)
+    eq_(json.loads(json.dumps(conf.global_conf))['def1'], 'a')